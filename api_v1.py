@@ -0,0 +1,207 @@
+# api_v1.py — JSON API under /api/v1 for scripts, alongside the HTML routes
+#
+# Listings select only the requested columns and serialise the row tuples
+# directly: no ORM objects, no templates.  Sorting, filtering and keyset
+# cursors are the ones home() uses (crud/book.py), so a cursor from either
+# works in both.  orjson encodes the responses when it is installed.
+# POST /books/batch applies many writes in one transaction (crud/batch.py).
+import json
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+from sqlalchemy import select, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db, get_read_db
+from crud.batch import apply_batch, summarize, MAX_OPERATIONS
+from crud.book import (
+    book_filters, apply_filters, apply_sort, apply_cursor, encode_cursor, sort_spec,
+    STORED_COLUMNS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+    )
+from models import Book
+from schemas import BookPage, BookBatch, BatchWrite, BatchWriteResult
+from services.isbn_batch import normalize_batch
+from services import dedupe
+from services.page_cache import page_cache
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the standard library encoder
+    orjson = None
+
+MAX_BATCH = 1000
+# Field name -> column; what fields= may ask for, in the default order
+FIELDS = {column.name: column for column in STORED_COLUMNS}
+
+
+def _default(value):
+    # Prices as strings, like /export.jsonl, so no cents are lost to floats
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """
+    Encodes with orjson when available.  Handlers return it directly: a
+    plain dict would first go through FastAPI's jsonable_encoder, which
+    walks every value and costs more than the encoding itself.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+router = APIRouter(prefix="/api/v1", default_response_class=FastJSONResponse, tags=["api"])
+
+
+def _fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(FIELDS)
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Unknown field(s): {', '.join(unknown)}; choose from {', '.join(FIELDS)}")
+    return names
+
+
+def _columns(names: Sequence[str], *internal) -> list:
+    """The requested columns, then any ``internal`` ones (ids, sort keys) not among them."""
+    columns = [FIELDS[n] for n in names]
+    columns += [c for c in internal if c is not None and c.key not in names]
+    return columns
+
+
+def _items(names: Sequence[str], rows) -> List[Dict]:
+    # zip stops at the requested fields, dropping the internal columns
+    return [dict(zip(names, row)) for row in rows]
+
+
+@router.get("/books", responses={200: {"model": BookPage}})
+async def list_books(
+    fields: Optional[str] = None,
+    sort: str = "title_asc",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    count: bool = False,
+    filters: dict = Depends(book_filters),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    One page of the collection, sorted and filtered like home().  ``fields``
+    is a comma-separated column list; pass ``next_cursor`` back as ``cursor``
+    for the following page.  ``count=true`` adds the number of matching books.
+    """
+    names = _fields(fields)
+    sort_column, _ = sort_spec(sort)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        query = apply_sort(apply_filters(select(*_columns(names, Book.id, sort_column)), **filters), sort)
+        if cursor:
+            query = apply_cursor(query, sort, cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    rows = (await db.execute(query.limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, rows[-1])
+    page = {"items": _items(names, rows), "next_cursor": next_cursor}
+    if count:
+        page["total"] = (await db.execute(apply_filters(select(func.count(Book.id)), **filters))).scalar_one()
+    return FastJSONResponse(page)
+
+
+@router.get("/books/batch", responses={200: {"model": BookBatch}})
+async def get_books_batch(
+    ids: Optional[str] = None,
+    isbns: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Several books in one query, by comma-separated ``ids`` and/or ``isbns``
+    (either form, hyphens allowed), in the order asked.  Inputs matching no
+    book are returned in ``missing``.
+    """
+    names = _fields(fields)
+    try:
+        id_list = list(dict.fromkeys(int(i) for i in (ids or "").split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(400, "ids must be comma-separated integers")
+    isbn_list = list(dict.fromkeys(i.strip() for i in (isbns or "").split(",") if i.strip()))
+    if len(id_list) + len(isbn_list) > MAX_BATCH:
+        raise HTTPException(413, f"At most {MAX_BATCH:,} ids and ISBNs per request")
+
+    # Valid ISBNs match in their ISBN-13 form; anything else as typed, since invalid ones are stored as given
+    cleaned = [i.replace("-", "").replace(" ", "").upper() for i in isbn_list]
+    keys = [isbn13 or raw for isbn13, raw in zip(normalize_batch(cleaned).isbn13, cleaned)] if cleaned else []
+    conditions = []
+    if id_list:
+        conditions.append(Book.id.in_(id_list))
+    if keys:
+        conditions.append(Book.isbn13.in_(set(keys)))
+        conditions.append(Book.isbn10.in_(set(keys)))
+    if not conditions:
+        return FastJSONResponse({"items": [], "missing": []})
+
+    columns = _columns(names, Book.id, Book.isbn13, Book.isbn10)
+    position = {column.key: i for i, column in enumerate(columns)}
+    rows = (await db.execute(select(*columns).where(or_(*conditions)))).all()
+    by_id = {row[position["id"]]: row for row in rows}
+    by_isbn = {row[position[c]]: row for row in rows for c in ("isbn13", "isbn10") if row[position[c]]}
+
+    found, missing = [], []
+    for book_id in id_list:
+        if book_id in by_id:
+            found.append(by_id[book_id])
+        else:
+            missing.append(str(book_id))
+    for isbn, key in zip(isbn_list, keys):
+        if key in by_isbn:
+            found.append(by_isbn[key])
+        else:
+            missing.append(isbn)
+    return FastJSONResponse({"items": _items(names, found), "missing": missing})
+
+
+@router.get("/books/{book_id}")
+async def get_book_fields(book_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    """One book, optionally projected to ``fields``."""
+    names = _fields(fields)
+    row = (await db.execute(select(*_columns(names)).where(Book.id == book_id))).first()
+    if row is None:
+        raise HTTPException(404, "Book not found")
+    return FastJSONResponse(dict(zip(names, row)))
+
+
+@router.post("/books/batch", responses={200: {"model": BatchWriteResult}, 400: {"model": BatchWriteResult}})
+async def write_books_batch(batch: BatchWrite, db: AsyncSession = Depends(get_db)):
+    """
+    Add, update and delete many books in one transaction, e.g.
+    ``{"operations": [{"op": "update", "id": 3, "set": {"date_read": "2024-05-01"}},
+    {"op": "delete", "id": 9}]}``.  Every operation gets a result, in order.
+    With ``"atomic": true`` nothing is applied unless every operation
+    succeeds, and the response is a 400.
+    """
+    if len(batch.operations) > MAX_OPERATIONS:
+        raise HTTPException(413, f"At most {MAX_OPERATIONS:,} operations per request")
+    applied, results, touched = await apply_batch(db, batch.operations, atomic=batch.atomic)
+    if touched:
+        await page_cache.invalidate(*touched)
+        await dedupe.schedule_refresh(db)
+    return FastJSONResponse({"applied": applied, "summary": summarize(results), "results": results},
+                            status_code=200 if applied else 400)
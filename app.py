@@ -3,7 +3,7 @@ from fastapi import FastAPI, Form, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import Column, Integer, String, select, or_, update, delete, text
+from sqlalchemy import Column, Integer, String, select, or_, update, delete
 from sqlalchemy.ext.declarative import declarative_base
 import httpx
 
@@ -31,13 +31,8 @@ app = FastAPI()
 
 @app.on_event("startup")
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        result = await conn.execute(text("PRAGMA table_info(books);"))
-        columns = [row[1] for row in result.fetchall()]
-        if "cover_url" not in columns:
-            await conn.execute(text("ALTER TABLE books ADD COLUMN cover_url TEXT"))
-            await conn.commit()
+    from migrations import migrate  # the schema is owned by migrations.py; shares books.db with main.py
+    await migrate(engine)
 
 async def google_lookup(title="", author="", isbn=""):
     if not (title or author or isbn):
@@ -0,0 +1,113 @@
+# benchmarks/batch_writes.py — per-book routes vs one POST /api/v1/books/batch
+#
+#   python benchmarks/batch_writes.py [--ops 2000]
+#
+# Against a fresh temporary database, sets date_read on --ops books, then
+# deletes --ops books, then adds --ops books: first one request per book
+# through the HTML routes (/edit, /delete, /add), then on a different set
+# of books with a single batch call each.  Requests go through an
+# in-process ASGI transport.  Exits 1 unless both ways leave the same result.
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOOKTRACKER_DB", os.path.join(tempfile.mkdtemp(prefix="booktracker-batch-"), "books.db"))
+os.environ["BOOKTRACKER_JOB_WORKERS"] = "0"
+
+import httpx  # noqa: E402
+
+from database import init_db, DATABASE_PATH  # noqa: E402
+
+READ_DATE = "2024-05-01"
+
+
+def seed(count: int):
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.executemany("INSERT INTO books (title, author, copies) VALUES (?, ?, 1)",
+                     [(f"Seed {i}", f"Author {i % 50}") for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def check(query: str, *params) -> int:
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        return conn.execute(query, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def timed(label: str, n: int, work) -> float:
+    started = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<34} {elapsed * 1000:9.1f}ms  {n / elapsed:10,.0f} ops/s")
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-book routes vs the batch write API")
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+    n = args.ops
+
+    await init_db()
+    seed(4 * n + 1)   # the last row stays, so SQLite can't hand deleted ids to the added books
+    import main as app_module
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://bench")
+    single_ids, batch_ids = range(1, n + 1), range(n + 1, 2 * n + 1)
+    single_deletes, batch_deletes = range(2 * n + 1, 3 * n + 1), range(3 * n + 1, 4 * n + 1)
+
+    async def post(url, **kwargs):
+        r = await client.post(url, **kwargs)
+        assert r.status_code < 400, (url, r.status_code, r.text[:200])
+        return r
+
+    async def batch(operations):
+        body = (await post("/api/v1/books/batch", json={"operations": operations})).json()
+        assert body["applied"] and set(body["summary"]) <= {"updated", "deleted", "created"}, body["summary"]
+
+    print(f"{n:,} operations of each kind")
+    speedups = []
+    single = await timed("set date_read, one /edit each", n, lambda: asyncio.gather(*(
+        post(f"/edit/{i}", data={"title": f"Seed {i - 1}", "author": f"Author {(i - 1) % 50}", "date_read": READ_DATE})
+        for i in single_ids)))
+    batched = await timed("set date_read, one batch", n, lambda: batch(
+        [{"op": "update", "id": i, "set": {"date_read": READ_DATE}} for i in batch_ids]))
+    speedups.append(single / batched)
+
+    single = await timed("delete, one /delete each", n, lambda: asyncio.gather(*(
+        post(f"/delete/{i}") for i in single_deletes)))
+    batched = await timed("delete, one batch", n, lambda: batch(
+        [{"op": "delete", "id": i} for i in batch_deletes]))
+    speedups.append(single / batched)
+
+    single = await timed("add, one /add each", n, lambda: asyncio.gather(*(
+        post("/add", data={"title": f"Single {i}", "author": "New", "lookup": "false"}) for i in range(n))))
+    batched = await timed("add, one batch", n, lambda: batch(
+        [{"op": "add", "book": {"title": f"Batch {i}", "author": "New"}} for i in range(n)]))
+    speedups.append(single / batched)
+    await client.aclose()
+
+    results = {
+        "date_read": (check("SELECT count(*) FROM books WHERE date_read = ? AND id <= ?", READ_DATE, n),
+                      check("SELECT count(*) FROM books WHERE date_read = ? AND id BETWEEN ? AND ?", READ_DATE, n + 1, 2 * n)),
+        "deleted": (n - check("SELECT count(*) FROM books WHERE id BETWEEN ? AND ?", 2 * n + 1, 3 * n),
+                    n - check("SELECT count(*) FROM books WHERE id BETWEEN ? AND ?", 3 * n + 1, 4 * n)),
+        "added": (check("SELECT count(*) FROM books WHERE title LIKE 'Single %'"),
+                  check("SELECT count(*) FROM books WHERE title LIKE 'Batch %'")),
+    }
+    ok = all(single == batched == n for single, batched in results.values())
+    print(f"speedup {', '.join(f'{s:.0f}x' for s in speedups)}; per-book vs batch results {results} "
+          f"-> {'OK' if ok else 'MISMATCH'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
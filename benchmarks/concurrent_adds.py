@@ -0,0 +1,53 @@
+# benchmarks/concurrent_adds.py — hammer add_copy_or_create with simultaneous adds of one book
+#
+#   python benchmarks/concurrent_adds.py [--adds 300]
+#
+# Fires --adds concurrent adds of the same book against a fresh temporary
+# database, alternating between the ISBN-13 and ISBN-10 forms, each in its
+# own session.  Exits 1 unless exactly one row exists with copies == --adds.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOOKTRACKER_DB", os.path.join(tempfile.mkdtemp(prefix="booktracker-adds-"), "books.db"))
+
+from sqlalchemy import select  # noqa: E402
+
+from database import init_db, AsyncSessionLocal  # noqa: E402
+from crud.book import add_copy_or_create  # noqa: E402
+from models import Book  # noqa: E402
+from schemas import BookCreate  # noqa: E402
+
+ISBN13, ISBN10 = "9780441172719", "0441172717"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent add_copy_or_create check")
+    parser.add_argument("--adds", type=int, default=300)
+    args = parser.parse_args()
+    await init_db()
+
+    async def add(n):
+        form = {"isbn13": ISBN13} if n % 2 else {"isbn10": ISBN10}
+        async with AsyncSessionLocal() as db:
+            await add_copy_or_create(db, BookCreate(title="Dune", author="Frank Herbert", **form))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(add(n) for n in range(args.adds)))
+    elapsed = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(Book.id, Book.copies))).all()
+    ok = len(rows) == 1 and rows[0].copies == args.adds
+    print(f"{args.adds} concurrent adds in {elapsed:.2f}s ({args.adds / elapsed:.0f}/s): "
+          f"{len(rows)} row(s), copies={[r.copies for r in rows]} -> {'OK' if ok else 'FAILED'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
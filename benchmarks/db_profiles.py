@@ -0,0 +1,99 @@
+# benchmarks/db_profiles.py — read/write throughput of each SQLite engine profile
+#
+#   python benchmarks/db_profiles.py [--seconds 5] [--writers 8] [--readers 8] [--json out.json]
+#
+# Each profile gets a fresh temporary database seeded with books.  Writers
+# insert a book and bump copies on a random one, one commit each, the way
+# /add and /edit do; readers run the default home() page query.  Writes go
+# through the read/write engine, reads through the read-only pool.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, update, insert, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from database import Base, ENGINE_PROFILES, make_engine  # noqa: E402
+from models import Book  # noqa: E402
+from crud.book import apply_sort  # noqa: E402
+
+SEED_BOOKS = 10_000
+
+
+async def run_profile(profile: str, seconds: float, writers: int, readers: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="booktracker-bench-"), "books.db")
+    engine = make_engine(f"sqlite+aiosqlite:///{path}", profile)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Book), [
+            {"title": f"Book {i}", "author": f"Author {i % 500}", "copies": 1} for i in range(SEED_BOOKS)])
+    read_engine = make_engine(f"sqlite+aiosqlite:///file:{path}?mode=ro&uri=true", profile, read_only=True,
+                              pool_size=readers)
+
+    counts = {"writes": 0, "reads": 0, "locked": 0}
+    deadline = time.monotonic() + seconds
+
+    async def writer(n):
+        while time.monotonic() < deadline:
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(insert(Book).values(title=f"New {n}", author="Bench", copies=1))
+                async with engine.begin() as conn:
+                    await conn.execute(update(Book).where(Book.id == random.randint(1, SEED_BOOKS))
+                                       .values(copies=Book.copies + 1))
+                counts["writes"] += 2
+            except OperationalError:
+                counts["locked"] += 1
+
+    async def reader():
+        query = apply_sort(select(Book), "title_asc").limit(50)
+        while time.monotonic() < deadline:
+            try:
+                async with read_engine.connect() as conn:
+                    (await conn.execute(query)).all()
+                counts["reads"] += 1
+            except OperationalError:
+                counts["locked"] += 1
+
+    await asyncio.gather(*(writer(n) for n in range(writers)), *(reader() for _ in range(readers)))
+    async with engine.connect() as conn:
+        journal = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+    await engine.dispose()
+    await read_engine.dispose()
+    return {
+        "profile": profile,
+        "journal_mode": journal,
+        "writes_per_second": round(counts["writes"] / seconds, 1),
+        "reads_per_second": round(counts["reads"] / seconds, 1),
+        "locked_errors": counts["locked"],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for profile in ENGINE_PROFILES:
+        result = await run_profile(profile, args.seconds, args.writers, args.readers)
+        print(f"{profile:>8}: {result['writes_per_second']:>8} writes/s  {result['reads_per_second']:>8} reads/s  "
+              f"{result['locked_errors']} locked  (journal_mode={result['journal_mode']})")
+        results.append(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
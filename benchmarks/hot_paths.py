@@ -0,0 +1,239 @@
+# benchmarks/hot_paths.py — timings for the request hot paths, emitted as JSON
+#
+#   python benchmarks/hot_paths.py [--sizes 1000 10000 100000] [--iterations 20]
+#                                  [--output results.json] [--compare baseline.json] [--threshold 0.25]
+#
+# Every collection size runs in its own subprocess against a fresh temporary
+# books.db (the database path is fixed when database.py is imported), seeded
+# with synthetic books.  Provider lookups go to benchmarks/stub_providers.py
+# through an in-process ASGI transport, so no request leaves the machine.
+# With --compare, cases whose median got slower than the threshold are
+# listed and the exit status is 1.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SORTS = ["title_asc", "title_desc", "author_asc", "author_desc", "date_read_asc", "date_read_desc",
+         "date_purchased_asc", "date_purchased_desc", "publisher_asc", "publisher_desc",
+         "format_asc", "format_desc", "_"]
+FILTERS = {
+    "format": {"format": "Paperback"},
+    "publisher": {"publisher": "DAW"},
+    "date_read": {"date_read_from": "2015-01-01", "date_read_to": "2018-12-31"},
+    "date_purchased": {"date_purchased_from": "2010-01-01", "date_purchased_to": "2012-12-31"},
+}
+SEARCHES = ["dragon", "the", "herb", "war peace"]
+PUBLISHERS = ["DAW", "Ace", "Tor", "Baen", "Del Rey", "Penguin", None]
+FORMATS = ["Paperback", "Hardcover", "Mass Market Paperback", "Trade Paperback", None]
+WORDS = ["dragon", "star", "night", "war", "peace", "the", "shadow", "king", "sea", "machine", "garden", "herb"]
+
+
+def isbn13(n: int) -> str:
+    body = f"978{n:09d}"
+    check = (10 - sum((1, 3)[i % 2] * int(d) for i, d in enumerate(body)) % 10) % 10
+    return body + str(check)
+
+
+def seed(path: str, size: int):
+    rng = random.Random(size)
+    start = date(2000, 1, 1)
+
+    def maybe_date():
+        return (start + timedelta(days=rng.randint(0, 9000))).isoformat() if rng.random() < 0.7 else None
+
+    rows = [(
+        " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 4))),
+        f"Author {rng.randint(1, size // 10 + 1)}",
+        isbn13(i), "Synthetic description " + " ".join(rng.choices(WORDS, k=12)),
+        rng.randint(1, 3), maybe_date(), maybe_date(), rng.choice(PUBLISHERS), rng.choice(FORMATS),
+        rng.randint(80, 900),
+    ) for i in range(size)]
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO books (title, author, isbn13, description, copies, date_read, date_purchased, "
+        "publisher, book_format, pages) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+        "min_ms": round(samples[0] * 1000, 3),
+    }
+
+
+async def measure(fn, iterations: int):
+    await fn()  # warm-up
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+async def run_size(size: int, iterations: int) -> dict:
+    import httpx
+    from database import init_db, AsyncSessionLocal, ReadSessionLocal, DATABASE_PATH
+    from crud.book import get_books, add_copy_or_create
+    from schemas import BookCreate
+    from services import http_client
+    from services.lookup_cache import lookup_cache
+    from benchmarks import stub_providers
+    import main
+
+    await init_db()
+    seed(DATABASE_PATH, size)
+    await http_client.start_client(httpx.ASGITransport(app=stub_providers.app))
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+    results = {}
+
+    async def get(url):
+        r = await client.get(url)
+        assert r.status_code == 200, (url, r.status_code)
+
+    for sort in SORTS:
+        results[f"home sort={sort}"] = await measure(lambda: get(f"/?sort={sort}"), iterations)
+    for name, params in FILTERS.items():
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        results[f"home filter={name}"] = await measure(lambda: get(f"/?{query}"), iterations)
+    results["home page 3"] = await measure(lambda: _walk_pages(client, 3), iterations)
+    results["api books limit=500"] = await measure(lambda: get("/api/v1/books?limit=500"), iterations)
+    results["api books fields=id,title"] = await measure(lambda: get("/api/v1/books?limit=500&fields=id,title"), iterations)
+
+    for q in SEARCHES:
+        async def search():
+            async with ReadSessionLocal() as db:
+                await get_books(db, q)
+        results[f"get_books q={q!r}"] = await measure(search, iterations)
+
+    counter = iter(range(10**9))
+
+    async def add_new():
+        async with AsyncSessionLocal() as db:
+            await add_copy_or_create(db, BookCreate(title="Bench", author="Bench", isbn13=isbn13(size + next(counter))))
+
+    async def add_existing():
+        async with AsyncSessionLocal() as db:
+            await add_copy_or_create(db, BookCreate(title="Bench", author="Bench", isbn13=isbn13(size // 2)))
+
+    results["add_copy_or_create new"] = await measure(add_new, iterations)
+    results["add_copy_or_create existing"] = await measure(add_existing, iterations)
+
+    async def edit():
+        book_id = random.randint(1, size)
+        r = await client.post(f"/edit/{book_id}", data={
+            "title": "Edited", "author": "Bench", "isbn13": isbn13(book_id - 1), "publisher": "DAW",
+            "date_read": "2020-02-02", "pages": "123"})
+        assert r.status_code == 303, r.status_code
+    results["update_book_route"] = await measure(edit, iterations)
+
+    async def lookup(cold: bool):
+        if cold:
+            lookup_cache.clear()
+        r = await client.post("/lookup", data={"isbn": isbn13(7)})
+        assert r.status_code == 200, r.status_code
+    results["/lookup cold cache"] = await measure(lambda: lookup(True), iterations)
+    results["/lookup warm cache"] = await measure(lambda: lookup(False), iterations)
+
+    await client.aclose()
+    await http_client.close_client()
+    return results
+
+
+async def _walk_pages(client, pages: int):
+    url = "/?sort=title_asc"
+    for _ in range(pages):
+        r = await client.get(url)
+        assert r.status_code == 200
+        marker = 'class="btn btn-outline-primary">Next'
+        if marker not in r.text:
+            return
+        url = r.text.split(marker)[0].rsplit('href="', 1)[1].split('"')[0].replace("&amp;", "&")
+
+
+def run_in_subprocess(size: int, iterations: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="booktracker-bench-")
+    env = dict(os.environ,
+               BOOKTRACKER_DB=os.path.join(workdir, "books.db"),
+               BOOKTRACKER_LOOKUP_CACHE=os.path.join(workdir, "lookup_cache.db"),
+               BOOKTRACKER_COVER_DIR=os.path.join(workdir, "covers"))
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", str(size), "--iterations", str(iterations)],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for size, cases in current["results"].items():
+        for case, stats in cases.items():
+            before = baseline.get("results", {}).get(size, {}).get(case)
+            if before and stats["median_ms"] > before["median_ms"] * (1 + threshold):
+                regressions.append(f"{size} books, {case}: {before['median_ms']} ms -> {stats['median_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BookTracker request hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown (0.25 = 25%%)")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_size(args.worker, args.iterations))))
+        return
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"benchmarking {size:,} books...", file=sys.stderr)
+        report["results"][str(size)] = run_in_subprocess(size, args.iterations)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/isbn_batch.py — per-item ISBN functions vs. services/isbn_batch
+#
+#   python benchmarks/isbn_batch.py [--sizes 1000 100000] [--seed 1]
+#
+# Generates a realistic mix of inputs (valid ISBN 10s and 13s, dashed ones,
+# bad check digits, wrong lengths, stray characters), checks that the batch
+# results agree with is_valid/to_isbn13/to_isbn10 item by item, and prints
+# the time each approach takes.  Exit status is 1 if any result disagrees.
+import argparse
+import random
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services import isbn_batch  # noqa: E402
+from services.isbn_utils import is_valid, to_isbn10, to_isbn13, isbn13_check_digit  # noqa: E402
+
+
+def make_inputs(n: int, rng: random.Random):
+    inputs = []
+    for _ in range(n):
+        body = "".join(rng.choice("0123456789") for _ in range(9))
+        prefix = rng.choice(["978", "978", "978", "979"])
+        isbn13 = prefix + body + isbn13_check_digit(prefix + body)
+        kind = rng.random()
+        if kind < 0.45:
+            inputs.append(isbn13)
+        elif kind < 0.70:
+            inputs.append(to_isbn10("978" + body + isbn13_check_digit("978" + body)))
+        elif kind < 0.80:
+            inputs.append(f"{isbn13[:3]}-{isbn13[3]}-{isbn13[4:7]}-{isbn13[7:12]}-{isbn13[12]}")
+        elif kind < 0.90:
+            inputs.append(isbn13[:12] + str((int(isbn13[12]) + 1) % 10))
+        elif kind < 0.95:
+            inputs.append(isbn13[:rng.randint(1, 12)])
+        else:
+            inputs.append(isbn13[:5] + rng.choice("abc?") + isbn13[6:])
+    return inputs
+
+
+def scalar(inputs):
+    results = []
+    for isbn in inputs:
+        try:
+            ok = is_valid(isbn)
+        except ValueError:
+            ok = False
+        if not ok:
+            results.append((None, None))
+            continue
+        results.append((to_isbn13(isbn, validate=False), to_isbn10(isbn, validate=False)))
+    return results
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    numpy_available = isbn_batch.np is not None
+    mismatches = 0
+    print(f"NumPy: {'yes' if numpy_available else 'not installed, numpy column skipped'}")
+    print(f"{'size':>8} {'scalar':>10} {'python':>10} {'numpy':>10}")
+    for size in args.sizes:
+        inputs = make_inputs(size, rng)
+        expected, t_scalar = timed(scalar, inputs)
+        cleaned = [isbn.replace("-", "").replace(" ", "").upper() for isbn in inputs]
+        python, t_python = timed(isbn_batch._normalize_python, cleaned)
+        runs = [python]
+        t_numpy = None
+        if numpy_available:
+            vectorized, t_numpy = timed(isbn_batch.normalize_batch, inputs)
+            runs.append(vectorized)
+        for run in runs:
+            got = list(zip(run.isbn13, run.isbn10))
+            mismatches += sum(1 for a, b in zip(got, expected) if a != b)
+        numpy_col = f"{t_numpy * 1000:9.1f}ms" if t_numpy is not None else f"{'-':>10}"
+        print(f"{size:>8} {t_scalar * 1000:9.1f}ms {t_python * 1000:9.1f}ms {numpy_col}")
+    if mismatches:
+        print(f"{mismatches} results differ from the per-item functions")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# benchmarks/loadtest.py — mixed read/write load against main:app with stub metadata providers
+#
+#   python benchmarks/loadtest.py [--seconds 30] [--users 20] [--workers 1] [--books 2000]
+#       [--mix home=40,search=20,edit=10,lookup=15,add=15]
+#       [--google lognormal:120:0.6,errors=0.02,timeouts=0.01] [--openlibrary ...] [--isbndb ...]
+#       [--output results.json] [--max-error-rate 0.05]
+#
+# Starts one benchmarks/stub_providers.py server per provider, each with its
+# own latency distribution and error, timeout and not-found rates, and
+# serve.py against a fresh temporary database seeded with --books books,
+# with the BOOKTRACKER_*_URL settings pointing the providers at the stubs.
+# --users simulated users then send the --mix of requests for --seconds.
+# /lookup and /add use ISBNs no cache has seen, so they reach the stubs.
+# Prints throughput, p50/p95/p99 latency and error rate per route; with
+# --max-error-rate, exits 1 if any route's error rate is higher.
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+WORKDIR = tempfile.mkdtemp(prefix="booktracker-load-")
+os.environ.setdefault("BOOKTRACKER_DB", os.path.join(WORKDIR, "books.db"))
+os.environ["BOOKTRACKER_LOOKUP_CACHE"] = os.path.join(WORKDIR, "lookup_cache.db")
+os.environ["BOOKTRACKER_OPENLIBRARY_INDEX"] = os.path.join(WORKDIR, "openlibrary.db")   # never built: always a miss
+os.environ["BOOKTRACKER_PAGE_CACHE_PATH"] = os.path.join(WORKDIR, "page_cache.db")
+
+import httpx  # noqa: E402
+
+from database import init_db, engine, DATABASE_PATH  # noqa: E402
+from services.isbn_utils import isbn13_check_digit  # noqa: E402
+
+PROVIDERS = {"google": "BOOKTRACKER_GOOGLE_BOOKS_URL",
+             "openlibrary": "BOOKTRACKER_OPENLIBRARY_URL",
+             "isbndb": "BOOKTRACKER_ISBNDB_URL"}
+DEFAULT_BEHAVIOR = {
+    "google": "lognormal:120:0.6,errors=0.02,timeouts=0.01,not_found=0.1",
+    "openlibrary": "lognormal:250:0.8,errors=0.03,timeouts=0.02,not_found=0.2",
+    "isbndb": "lognormal:90:0.4,errors=0.01,not_found=0.3",
+}
+DEFAULT_MIX = "home=40,search=20,edit=10,lookup=15,add=15"
+WORDS = ["night", "river", "empire", "glass", "winter", "dragon", "signal", "harbor", "engine", "garden"]
+SORTS = ["title_asc", "author_asc", "publisher_desc", "date_read_desc"]
+
+
+def isbn13(n: int) -> str:
+    stem = f"979{n:09d}"
+    return stem + str(isbn13_check_digit(stem))
+
+
+def seed(count: int):
+    asyncio.run(init_db())
+    asyncio.run(engine.dispose())
+    rng = random.Random(11)
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.executemany(
+        "INSERT INTO books (title, author, publisher, pages, isbn13, copies) VALUES (?, ?, ?, ?, ?, 1)",
+        [(f"{' '.join(rng.sample(WORDS, 3)).title()} {i}", f"Author {rng.randrange(300)}",
+          f"Publisher {rng.randrange(40)}", rng.randrange(80, 900), isbn13(i)) for i in range(count)])
+    conn.commit()
+    conn.close()
+
+
+def stub_args(spec: str) -> List[str]:
+    """"lognormal:120:0.6,errors=0.02,timeouts=0.01" -> stub_providers.py command-line options."""
+    latency, *options = spec.split(",")
+    args = ["--latency", latency]
+    for option in options:
+        name, _, value = option.partition("=")
+        if name not in ("errors", "timeouts", "not_found"):
+            raise SystemExit(f"unknown stub option {name!r} in {spec!r}")
+        args += [f"--{name.replace('_', '-')}", value]
+    return args
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_listening(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1)]
+
+
+class Traffic:
+    """The request mix: one coroutine per route, picked at random by weight."""
+
+    def __init__(self, client: httpx.AsyncClient, books: int):
+        self.client = client
+        self.books = books
+        self.fresh = iter(range(10 ** 8, 10 ** 9))   # ISBNs no book or cache entry has
+
+    async def home(self):
+        return await self.client.get("/", params={"sort": random.choice(SORTS)})
+
+    async def search(self):
+        return await self.client.get("/search", params={"q": random.choice(WORDS)})
+
+    async def edit(self):
+        return await self.client.get(f"/edit/{random.randint(1, self.books)}")
+
+    async def lookup(self):
+        return await self.client.post("/lookup", data={"isbn": isbn13(next(self.fresh))})
+
+    async def add(self):
+        return await self.client.post("/add", data={"isbn": isbn13(next(self.fresh)), "lookup": "true"})
+
+
+async def drive(base: str, mix: Dict[str, int], users: int, seconds: float, books: int):
+    samples: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+    routes, weights = list(mix), list(mix.values())
+    async with httpx.AsyncClient(base_url=base, timeout=30.0,
+                                 limits=httpx.Limits(max_connections=users)) as client:
+        traffic = Traffic(client, books)
+        deadline = time.perf_counter() + seconds
+
+        async def user():
+            while time.perf_counter() < deadline:
+                route = random.choices(routes, weights)[0]
+                started = time.perf_counter()
+                try:
+                    ok = (await getattr(traffic, route)()).status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                samples[route].append((time.perf_counter() - started, ok))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(users)))
+        elapsed = time.perf_counter() - started
+        after = {path: (await client.get(path)).json() for path in ("/jobs", "/lookup/providers", "/lookup/cache")}
+    return samples, elapsed, after
+
+
+def report(samples, elapsed: float) -> Dict[str, Dict]:
+    results = {}
+    everything = [s for route_samples in samples.values() for s in route_samples]
+    for route, route_samples in sorted(samples.items()) + [("all", everything)]:
+        latencies = sorted(s[0] * 1000 for s in route_samples)
+        errors = sum(not s[1] for s in route_samples)
+        results[route] = {
+            "requests": len(route_samples),
+            "rps": round(len(route_samples) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "error_rate": round(errors / len(route_samples), 4) if route_samples else 0.0,
+        }
+    print(f"{'route':<8} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for route, r in results.items():
+        print(f"{route:<8} {r['requests']:>9,} {r['rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+              f"{r['p99_ms']:>9} {r['error_rate']:>8.2%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test main:app against stub metadata providers")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--workers", type=int, default=1, help="serve.py worker processes")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,... over home, search, edit, lookup, add")
+    for name, spec in DEFAULT_BEHAVIOR.items():
+        parser.add_argument(f"--{name}", default=spec,
+                            help="LATENCY[,errors=X][,timeouts=X][,not_found=X]; LATENCY as in stub_providers.py")
+    parser.add_argument("--output", help="also write the results as JSON")
+    parser.add_argument("--max-error-rate", type=float)
+    args = parser.parse_args()
+
+    mix = {route: int(weight) for route, _, weight in (part.partition("=") for part in args.mix.split(","))}
+    unknown = set(mix) - {"home", "search", "edit", "lookup", "add"}
+    if unknown:
+        raise SystemExit(f"unknown routes in --mix: {', '.join(sorted(unknown))}")
+
+    seed(args.books)
+    env = dict(os.environ, ISBNDB_API_KEY="stub")
+    processes = []
+    try:
+        for name, variable in PROVIDERS.items():
+            port = free_port()
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "benchmarks", "stub_providers.py"), "--port", str(port),
+                 *stub_args(getattr(args, name))], cwd=ROOT))
+            env[variable] = f"http://127.0.0.1:{port}"
+            wait_listening(port)
+        port = free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "serve.py"), "--workers", str(args.workers), "--port", str(port)],
+            cwd=ROOT, env=env))
+        wait_listening(port)
+
+        print(f"{args.users} users for {args.seconds:.0f}s against {args.workers} worker(s), "
+              f"{args.books:,} books, mix {args.mix}")
+        for name in PROVIDERS:
+            print(f"  {name:<12} {getattr(args, name)}")
+        samples, elapsed, after = asyncio.run(
+            drive(f"http://127.0.0.1:{port}", mix, args.users, args.seconds, args.books))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(30)
+
+    results = report(samples, elapsed)
+    print(f"jobs: {after['/jobs']}")
+    for name, status in after["/lookup/providers"].items():
+        print(f"provider {name}: breaker {status['breaker']}, p95 {status['p95_ms']}ms, timeout {status['timeout_s']}s")
+    print(f"lookup cache hit ratio: {after['/lookup/cache']['hit_ratio']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "routes": results, "after": after}, f, indent=2)
+    if args.max_error_rate is not None:
+        failing = [route for route, r in results.items() if r["error_rate"] > args.max_error_rate]
+        if failing:
+            print(f"error rate above {args.max_error_rate:.2%}: {', '.join(failing)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# benchmarks/multi_worker.py — throughput of serve.py at 1..N worker processes
+#
+#   python benchmarks/multi_worker.py [--workers 1 2 4] [--seconds 10] [--books 2000]
+#
+# Seeds a temporary database, then for each worker count starts serve.py,
+# checks that a book added through one worker shows up on the cached home
+# page of every worker, and drives a CPU-bound mix (uncached home pages,
+# full-text search, a 1000-ISBN batch) from one client process per worker.
+# Exits 1 if any worker served a stale page.
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOOKTRACKER_DB", os.path.join(tempfile.mkdtemp(prefix="booktracker-workers-"), "books.db"))
+os.environ["BOOKTRACKER_JOB_WORKERS"] = "0"
+
+import httpx  # noqa: E402
+
+from database import init_db, engine, DATABASE_PATH  # noqa: E402
+from services.isbn_utils import isbn13_check_digit  # noqa: E402
+
+WORDS = ["night", "river", "empire", "glass", "winter", "dragon", "signal", "harbor", "engine", "garden"]
+
+
+def seed(count: int):
+    asyncio.run(init_db())
+    asyncio.run(engine.dispose())
+    rng = random.Random(7)
+    rows = []
+    for i in range(count):
+        title = f"Seed {' '.join(rng.sample(WORDS, 3))} {i:05d}"
+        rows.append((title, f"Author {rng.randrange(300)}", f"Publisher {rng.randrange(40)}",
+                     rng.randrange(80, 900), 1))
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.executemany("INSERT INTO books (title, author, publisher, pages, copies) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def isbn_batch(size: int):
+    stems = [f"978{random.randrange(10 ** 9):09d}" for _ in range(size)]
+    return [s + str(isbn13_check_digit(s)) for s in stems]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base}/pages/cache", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def check_shared_cache(base: str, workers: int) -> bool:
+    """Warm every worker's page cache, add a book through one of them, then expect it everywhere."""
+    # A fresh connection per request, so requests spread over the workers
+    with httpx.Client(base_url=base, timeout=30.0, headers={"Connection": "close"}) as client:
+        for _ in range(workers * 8):
+            client.get("/")
+        title = f"Aardvark check {uuid.uuid4().hex[:8]}"
+        client.post("/add", data={"title": title, "author": "Benchmark", "lookup": "false"})
+        stale = sum(title not in client.get("/").text for _ in range(workers * 8))
+    print(f"  shared cache: {workers * 8 - stale}/{workers * 8} home pages show the new book")
+    return stale == 0
+
+
+async def _drive(base: str, seconds: float, concurrency: int, queue):
+    batch = isbn_batch(1000)
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def loop(client):
+        n = 0
+        while time.perf_counter() < deadline:
+            n += 1
+            started = time.perf_counter()
+            kind = n % 3
+            if kind == 0:
+                r = await client.get("/", params={"page_size": 100, "sort": "author_asc", "nocache": uuid.uuid4().hex})
+            elif kind == 1:
+                r = await client.get("/search", params={"q": random.choice(WORDS)})
+            else:
+                r = await client.post("/isbn/batch", json={"isbns": batch})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    async with httpx.AsyncClient(base_url=base, timeout=60.0,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        await asyncio.gather(*(loop(client) for _ in range(concurrency)))
+    queue.put(latencies)
+
+
+def drive(base: str, seconds: float, concurrency: int, queue):
+    asyncio.run(_drive(base, seconds, concurrency, queue))
+
+
+def run(workers: int, seconds: float, concurrency: int) -> bool:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "serve.py"), "--workers", str(workers),
+                               "--port", str(port)], cwd=ROOT, env=os.environ.copy())
+    try:
+        wait_ready(base)
+        ok = check_shared_cache(base, workers) if workers > 1 else True
+        queue = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=drive, args=(base, seconds, concurrency, queue))
+                   for _ in range(workers)]
+        for c in clients:
+            c.start()
+        latencies = sorted(x for _ in clients for x in queue.get())
+        for c in clients:
+            c.join()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000
+        print(f"  {workers} worker(s): {len(latencies) / seconds:7.1f} req/s  p50 {p50:6.1f}ms  p95 {p95:6.1f}ms")
+        return ok
+    finally:
+        server.terminate()
+        server.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve.py throughput by worker count")
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, cores}))
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=8, help="in-flight requests per client process")
+    parser.add_argument("--books", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(args.books)
+    print(f"{args.books:,} books, {cores} core(s), {args.seconds:.0f}s per run")
+    ok = all([run(n, args.seconds, args.concurrency) for n in args.workers])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
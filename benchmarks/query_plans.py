@@ -0,0 +1,80 @@
+# benchmarks/query_plans.py — check that every home() sort and filter is answered from an index
+#
+#   python benchmarks/query_plans.py [--size 20000] [--verbose]
+#
+# Builds a temporary books.db seeded like benchmarks/hot_paths.py, then runs
+# EXPLAIN QUERY PLAN on the listing queries crud/book.py generates: every
+# sort option on the first page and past a cursor, and every filter.  A sort
+# that needs "USE TEMP B-TREE FOR ORDER BY" or a filter that is not an index
+# search is reported, and the exit status is 1.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["BOOKTRACKER_DB"] = os.path.join(tempfile.mkdtemp(prefix="booktracker-plans-"), "books.db")
+
+from sqlalchemy import select, text  # noqa: E402
+
+from benchmarks.hot_paths import SORTS, FILTERS, seed  # noqa: E402
+from database import engine, init_db, AsyncSessionLocal, DATABASE_PATH  # noqa: E402
+from models import Book  # noqa: E402
+from crud.book import apply_filters, apply_sort, apply_cursor, encode_cursor  # noqa: E402
+
+
+async def plan(db, query) -> list:
+    compiled = query.compile(engine.sync_engine)
+    params = compiled.construct_params()
+    conn = await db.connection()
+    rows = await conn.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {compiled}", tuple(params[name] for name in compiled.positiontup))
+    return [row[-1] for row in rows]
+
+
+def problems(steps: list, sorted_by_index: bool) -> list:
+    if sorted_by_index:
+        return ["sorts in a temp B-tree"] if any("TEMP B-TREE FOR ORDER BY" in step for step in steps) else []
+    return [] if any(step.startswith("SEARCH books") for step in steps) else ["filter is not an index search"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Check the home() query plans use indexes")
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    await init_db()
+    seed(DATABASE_PATH, args.size)
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))  # statistics for the seeded table, not the empty one
+
+    cases = []
+    async with AsyncSessionLocal() as db:
+        for sort in SORTS:
+            query = apply_sort(select(Book), sort).limit(51)
+            cases.append((f"sort={sort}", query, True))
+            # The last row of the first page, as the next page's cursor
+            last = (await db.execute(query.offset(49).limit(1))).scalar_one()
+            cases.append((f"sort={sort} after cursor", apply_cursor(query, sort, encode_cursor(sort, last)), True))
+        for name, params in FILTERS.items():
+            cases.append((f"filter={name}", apply_sort(apply_filters(select(Book), **params), "title_asc"), False))
+
+        failures = 0
+        for label, query, sorted_by_index in cases:
+            steps = await plan(db, query)
+            found = problems(steps, sorted_by_index)
+            failures += bool(found)
+            print(f"{'FAIL' if found else 'ok  '} {label}{': ' + ', '.join(found) if found else ''}")
+            if found or args.verbose:
+                for step in steps:
+                    print(f"        {step}")
+
+    await engine.dispose()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
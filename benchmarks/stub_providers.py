@@ -0,0 +1,140 @@
+# benchmarks/stub_providers.py — local stand-ins for Google Books, Open Library and ISBNdb
+#
+# One ASGI app answers the request paths of all three providers with
+# deterministic, made-up metadata.  Benchmarks mount it in-process through
+# httpx.ASGITransport; it can also be served on its own, with made-up
+# latency, errors and hangs, for load tests (benchmarks/loadtest.py):
+#
+#   python benchmarks/stub_providers.py --port 9001 --latency lognormal:80:0.5 \
+#       --errors 0.02 --timeouts 0.01 --not-found 0.1
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="BookTracker stub providers")
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    A latency distribution in milliseconds, returned as a sampler in seconds:
+    "none", "fixed:MS", "uniform:LO:HI" or "lognormal:MEDIAN:SIGMA".
+    """
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "none":
+        return lambda: 0.0
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(*values) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda: random.lognormvariate(0.0, sigma) * median / 1000
+    raise ValueError(f"bad latency spec {spec!r}; use none, fixed:MS, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+
+
+@dataclass
+class Behavior:
+    """What share of requests is slow, fails, hangs or finds nothing.  The default is instant and always found."""
+    latency: Callable[[], float] = lambda: 0.0
+    errors: float = 0.0        # answered with a 503
+    timeouts: float = 0.0      # held for hang_seconds, past any provider timeout
+    not_found: float = 0.0
+    hang_seconds: float = 30.0
+
+
+behavior = Behavior()
+
+
+@app.middleware("http")
+async def misbehave(request: Request, call_next):
+    delay = behavior.latency()
+    roll = random.random()
+    if roll < behavior.timeouts:
+        delay = behavior.hang_seconds
+    if delay:
+        await asyncio.sleep(delay)
+    roll -= behavior.timeouts
+    if 0 <= roll < behavior.errors:
+        return JSONResponse({"error": "stub failure"}, status_code=503)
+    roll -= behavior.errors
+    if 0 <= roll < behavior.not_found and not request.url.path.startswith("/authors/"):
+        if request.url.path.startswith("/books/v1/"):
+            return JSONResponse({"kind": "books#volumes", "totalItems": 0})
+        return JSONResponse({"error": "Not Found"}, status_code=404)
+    return await call_next(request)
+
+
+def _title(isbn: str) -> str:
+    return f"Stub Book {isbn[-6:]}"
+
+
+@app.get("/books/v1/volumes")
+async def google_volumes(q: str = ""):
+    isbn = q.removeprefix("isbn:")
+    return {"items": [{"volumeInfo": {
+        "title": _title(isbn),
+        "authors": ["Stub Author"],
+        "description": "A book that only exists in benchmarks.",
+        "publisher": "Stub Press",
+        "pageCount": 320,
+        "imageLinks": {"thumbnail": f"https://covers.example/{isbn}.jpg"},
+        "industryIdentifiers": [{"type": "ISBN_13", "identifier": isbn}],
+    }}]}
+
+
+@app.get("/isbn/{isbn}.json")
+async def openlibrary_edition(isbn: str):
+    return {
+        "title": _title(isbn),
+        "authors": [{"key": f"/authors/OL{isbn[-4:]}A"}],
+        "publishers": ["Stub Press"],
+        "number_of_pages": 320,
+        "covers": [int(isbn[-6:])],
+    }
+
+
+@app.get("/authors/{key}.json")
+async def openlibrary_author(key: str):
+    return {"name": f"Stub Author {key}"}
+
+
+@app.get("/book/{isbn}")
+async def isbndb_book(isbn: str):
+    if isbn.endswith("0"):
+        return JSONResponse({"errorMessage": "Not Found"}, status_code=404)
+    return {"book": {
+        "title": _title(isbn),
+        "authors": ["Stub Author"],
+        "synopsis": "A book that only exists in benchmarks.",
+        "publisher": "Stub Press",
+        "pages": 320,
+        "isbn13": isbn,
+    }}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the stub providers with made-up latency and failures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", default="none", help="none, fixed:MS, uniform:LO:HI or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--errors", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--timeouts", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--not-found", type=float, default=0.0, help="share of lookups that find nothing")
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    args = parser.parse_args()
+    behavior.latency = parse_latency(args.latency)
+    behavior.errors, behavior.timeouts = args.errors, args.timeouts
+    behavior.not_found, behavior.hang_seconds = args.not_found, args.hang_seconds
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# crud/batch.py — many adds, edits and deletes applied in one transaction
+#
+# Operations are grouped so the database sees a handful of statements, not
+# one round trip and commit per book: a multi-row INSERT for new books, an
+# executemany for extra copies of books already there, one
+# UPDATE ... WHERE id IN (...) per distinct change (an executemany when each
+# book gets its own values) and one DELETE ... WHERE id IN (...).  A group
+# that trips a constraint (two books given the same ISBN, say) is rolled
+# back to its savepoint and replayed item by item, so only the offending
+# items fail.  Adds run first, then updates, then deletes.
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select, insert, bindparam, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from crud.book import _with_both_isbns
+from models import Book
+from schemas import AddOperation, BatchOperation, DeleteOperation, UpdateOperation
+
+MAX_OPERATIONS = 10_000
+CHUNK = 5000   # ids per IN list, well under SQLite's bound-parameter limit
+FAILED = {"invalid", "not_found", "error"}
+
+_operation = TypeAdapter(BatchOperation)
+table = Book.__table__
+
+
+def _chunks(values: List, size: int = CHUNK) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'op'}: {err['msg']}" for err in e.errors())
+
+
+def _constraint_message(e: IntegrityError) -> str:
+    return str(e.orig)
+
+
+async def _guarded(conn: AsyncConnection, run_group, items: List, run_item, fail):
+    """
+    ``run_group()`` inside a savepoint; if it violates a constraint, undo it
+    and ``run_item(item)`` each item in its own savepoint instead, calling
+    ``fail(item, error)`` for the ones that still violate it.
+    """
+    await conn.exec_driver_sql("SAVEPOINT batch_group")
+    try:
+        await run_group()
+    except IntegrityError:
+        await conn.exec_driver_sql("ROLLBACK TO batch_group")
+        for item in items:
+            await conn.exec_driver_sql("SAVEPOINT batch_item")
+            try:
+                await run_item(item)
+            except IntegrityError as e:
+                await conn.exec_driver_sql("ROLLBACK TO batch_item")
+                fail(item, _constraint_message(e))
+            await conn.exec_driver_sql("RELEASE batch_item")
+    await conn.exec_driver_sql("RELEASE batch_group")
+
+
+async def _existing_ids(conn: AsyncConnection, ids: Set[int]) -> Set[int]:
+    found = set()
+    for chunk in _chunks(sorted(ids)):
+        found.update((await conn.execute(select(Book.id).where(Book.id.in_(chunk)))).scalars())
+    return found
+
+
+async def _add(conn: AsyncConnection, adds: List[Tuple[int, AddOperation]], results: List[Dict]):
+    """add_copy_or_create for many books: a known ISBN, or one seen earlier in the batch, adds a copy."""
+    books = [(i, _with_both_isbns(op.book.model_dump(exclude_unset=True))) for i, op in adds]
+    isbns = [v[c] for _, v in books for c in ("isbn13", "isbn10") if v.get(c)]
+    existing: Dict[str, int] = {}
+    for chunk in _chunks(isbns):
+        rows = await conn.execute(select(Book.id, Book.isbn13, Book.isbn10).where(
+            or_(Book.isbn13.in_(chunk), Book.isbn10.in_(chunk))))
+        for book_id, isbn13, isbn10 in rows:
+            existing.update({isbn: book_id for isbn in (isbn13, isbn10) if isbn})
+
+    increments: Dict[int, int] = Counter()
+    new_rows: List[Dict] = []
+    owners: List[List[int]] = []         # new row -> indexes of the operations it stands for
+    claimed: Dict[str, int] = {}         # ISBN -> new row
+    for i, values in books:
+        keys = [values[c] for c in ("isbn13", "isbn10") if values.get(c)]
+        book_id = next((existing[k] for k in keys if k in existing), None)
+        row = next((claimed[k] for k in keys if k in claimed), None)
+        if book_id is not None:
+            increments[book_id] += 1
+            results[i].update(status="copy_added", id=book_id)
+        elif row is not None:
+            new_rows[row]["copies"] += 1
+            owners[row].append(i)
+            results[i]["status"] = "copy_added"
+        else:
+            claimed.update({k: len(new_rows) for k in keys})
+            new_rows.append({**values, "copies": 1})
+            owners.append([i])
+            results[i]["status"] = "created"
+
+    if increments:
+        await conn.execute(
+            table.update().where(table.c.id == bindparam("b_id")).values(copies=table.c.copies + bindparam("b_copies")),
+            [{"b_id": book_id, "b_copies": n} for book_id, n in increments.items()])
+    if not new_rows:
+        return
+
+    columns = list(dict.fromkeys(c for row in new_rows for c in row))
+    rows = [{c: row.get(c) for c in columns} for row in new_rows]
+    statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+
+    def record(n: int, book_id: int):
+        for i in owners[n]:
+            results[i]["id"] = book_id
+
+    async def insert_all():
+        for n, book_id in enumerate((await conn.execute(statement, rows)).scalars()):
+            record(n, book_id)
+
+    async def insert_one(n: int):
+        record(n, (await conn.execute(insert(table).returning(table.c.id), rows[n])).scalar_one())
+
+    def fail(n: int, error: str):
+        for i in owners[n]:
+            results[i].update(status="error", id=None, error=error)
+
+    await _guarded(conn, insert_all, list(range(len(rows))), insert_one, fail)
+
+
+async def _update(conn: AsyncConnection, updates: List[Tuple[int, UpdateOperation]], results: List[Dict]):
+    changes: Dict[int, Dict[str, Any]] = {}      # book id -> columns to set; later operations win
+    owners: Dict[int, List[int]] = {}
+    for i, op in updates:
+        changes.setdefault(op.id, {}).update(op.set.model_dump(exclude_unset=True))
+        owners.setdefault(op.id, []).append(i)
+        results[i].update(status="updated", id=op.id)
+
+    def fail(book_id: int, error: str):
+        for i in owners[book_id]:
+            results[i].update(status="error", error=error)
+
+    async def update_one(book_id: int):
+        await conn.execute(table.update().where(table.c.id == book_id).values(**changes[book_id]))
+
+    # The same change to many books is one set-based UPDATE per IN list
+    same: Dict[tuple, List[int]] = {}
+    for book_id, values in changes.items():
+        if values:
+            same.setdefault(tuple(sorted(values.items())), []).append(book_id)
+        else:
+            for i in owners[book_id]:
+                results[i]["status"] = "unchanged"
+    singles: Dict[tuple, List[int]] = {}
+    for key, ids in same.items():
+        if len(ids) == 1:
+            singles.setdefault(tuple(c for c, _ in key), []).extend(ids)
+            continue
+        for chunk in _chunks(ids):
+            async def update_set(chunk=chunk, values=dict(key)):
+                await conn.execute(table.update().where(table.c.id.in_(chunk)).values(**values))
+            await _guarded(conn, update_set, chunk, update_one, fail)
+
+    # Books with values of their own: one executemany per set of columns
+    for columns, ids in singles.items():
+        async def update_many(columns=columns, ids=ids):
+            await conn.execute(
+                table.update().where(table.c.id == bindparam("b_id")).values({c: bindparam(f"b_{c}") for c in columns}),
+                [{"b_id": book_id, **{f"b_{c}": changes[book_id][c] for c in columns}} for book_id in ids])
+        await _guarded(conn, update_many, ids, update_one, fail)
+
+
+async def _delete(conn: AsyncConnection, deletes: List[Tuple[int, DeleteOperation]], results: List[Dict]):
+    ids = list(dict.fromkeys(op.id for _, op in deletes))
+    for chunk in _chunks(ids):
+        await conn.execute(table.delete().where(table.c.id.in_(chunk)))
+    for i, op in deletes:
+        results[i].update(status="deleted", id=op.id)
+
+
+async def apply_batch(db: AsyncSession, operations: List[Dict], atomic: bool = False
+                      ) -> Tuple[bool, List[Dict], Set[int]]:
+    """
+    Validate and apply ``operations`` (see schemas.BatchOperation) in one
+    transaction.  Returns (applied, results, touched book ids), one result
+    per operation in order: its index, op, status (created, copy_added,
+    updated, unchanged, deleted, invalid, not_found or error), book id and
+    error message.  With ``atomic``, any failed operation rolls back all of
+    them and nothing is applied.
+    """
+    results: List[Dict] = []
+    parsed: List[Optional[Any]] = []
+    for i, raw in enumerate(operations):
+        result = {"index": i, "op": raw.get("op"), "status": None, "id": None, "error": None}
+        try:
+            parsed.append(_operation.validate_python(raw))
+        except ValidationError as e:
+            parsed.append(None)
+            result.update(status="invalid", error=_validation_message(e))
+        results.append(result)
+
+    def rejected() -> bool:
+        return atomic and any(r["status"] in FAILED for r in results)
+
+    def unapplied() -> Tuple[bool, List[Dict], Set[int]]:
+        for r in results:
+            if r["status"] not in FAILED:
+                r.update(status="rolled_back", id=r["id"] if r["op"] != "add" else None)
+        return False, results, set()
+
+    if rejected():
+        return unapplied()
+
+    conn = await db.connection()
+    # Take the write lock up front; also makes the savepoints nest inside this transaction
+    await conn.exec_driver_sql("BEGIN IMMEDIATE")
+    targets = {op.id for op in parsed if isinstance(op, (UpdateOperation, DeleteOperation))}
+    existing = await _existing_ids(conn, targets) if targets else set()
+    adds, updates, deletes = [], [], []
+    for i, op in enumerate(parsed):
+        if op is None:
+            continue
+        if isinstance(op, AddOperation):
+            adds.append((i, op))
+        elif op.id not in existing:
+            results[i].update(status="not_found", id=op.id)
+        elif isinstance(op, UpdateOperation):
+            updates.append((i, op))
+        else:
+            deletes.append((i, op))
+
+    try:
+        if rejected():
+            await db.rollback()
+            return unapplied()
+        if adds:
+            await _add(conn, adds, results)
+        if updates:
+            await _update(conn, updates, results)
+        if deletes:
+            await _delete(conn, deletes, results)
+        if rejected():
+            await db.rollback()
+            return unapplied()
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    touched = {r["id"] for r in results if r["id"] is not None and r["status"] not in FAILED}
+    return True, results, touched
+
+
+def summarize(results: List[Dict]) -> Dict[str, int]:
+    return dict(Counter(r["status"] for r in results))
@@ -1,20 +1,193 @@
 # crud/book.py — ABSOLUTE IMPORTS, with copy counting
-from sqlalchemy import select, or_, update, delete
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import select, or_, and_, update, delete, asc, desc, collate, func, text, tuple_, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from crud.search import search_books
 from models import Book
 from schemas import BookCreate
-from typing import List, Optional
+from services.isbn_utils import to_isbn10, to_isbn13
+from typing import List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# sort option prefix -> column; the suffix is _asc or _desc
+SORT_COLUMNS = {
+    "title": Book.title,
+    "author": Book.author,
+    "date_read": Book.date_read,
+    "date_purchased": Book.date_purchased,
+    "publisher": Book.publisher,
+    "format": Book.book_format_norm,
+}
+DATE_COLUMNS = {Book.date_read, Book.date_purchased}
+# Stored columns, i.e. without generated ones like book_format_norm; what exports contain
+STORED_COLUMNS = [column for column in Book.__table__.columns if column.computed is None]
+# Must match the expressions of the ix_books_*_asc/_desc indexes in models.py
+NOCASE_COLUMNS = {Book.publisher}
+
+def sort_spec(sort: str):
+    """Return (column, descending) for a sort option; unknown options sort by id, newest first."""
+    field, _, direction = (sort or "").rpartition("_")
+    if field in SORT_COLUMNS and direction in ("asc", "desc"):
+        return SORT_COLUMNS[field], direction == "desc"
+    return None, True
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+def _sort_key(column):
+    return collate(column, "NOCASE") if column in NOCASE_COLUMNS else column
+
+def _like_prefix(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def book_filters(
+    format: Optional[str] = None,        # filter by format
+    publisher: Optional[str] = None,     # filter by publisher
+    date_read_from: Optional[str] = None,
+    date_read_to: Optional[str] = None,
+    date_purchased_from: Optional[str] = None,
+    date_purchased_to: Optional[str] = None,
+) -> dict:
+    """The listing filters as query parameters (a FastAPI dependency), shared by home(), the exports and /api/v1."""
+    return {
+        "format": format,
+        "publisher": publisher,
+        "date_read_from": date_read_from,
+        "date_read_to": date_read_to,
+        "date_purchased_from": date_purchased_from,
+        "date_purchased_to": date_purchased_to,
+    }
+
+def apply_filters(query, format: Optional[str] = None, publisher: Optional[str] = None,
+                  date_read_from: Optional[str] = None, date_read_to: Optional[str] = None,
+                  date_purchased_from: Optional[str] = None, date_purchased_to: Optional[str] = None):
+    """
+    The home() filters; shared by every listing of the collection.
+
+    Format and publisher are case-insensitive prefix matches, written so
+    SQLite can answer them as range searches on the indexes in models.py.
+    """
+    if format:
+        # book_format_norm is already lower-case, so a plain binary range works
+        prefix = format.strip().lower()
+        query = query.where(Book.book_format_norm >= prefix, Book.book_format_norm < prefix + "\U0010ffff")
+    if publisher:
+        # LIKE is case-insensitive in SQLite, matching the NOCASE index
+        query = query.where(Book.publisher.like(_like_prefix(publisher), escape="\\"))
+
+    if date_read_from:
+        query = query.where(Book.date_read >= _parse_date(date_read_from))
+    if date_read_to:
+        query = query.where(Book.date_read <= _parse_date(date_read_to))
+
+    if date_purchased_from:
+        query = query.where(Book.date_purchased >= _parse_date(date_purchased_from))
+    if date_purchased_to:
+        query = query.where(Book.date_purchased <= _parse_date(date_purchased_to))
+    return query
+
+def apply_sort(query, sort: str):
+    """
+    Order by the sort option with NULLs last, then by id in the same
+    direction so rows with equal sort values keep a stable order.
+    """
+    column, descending = sort_spec(sort)
+    direction_func = desc if descending else asc
+    if column is None:
+        return query.order_by(direction_func(Book.id))
+    key = direction_func(_sort_key(column))
+    if not column.nullable:
+        return query.order_by(key, direction_func(Book.id))
+    # NULLs last as (col IS NULL, col, id): the same expression the indexes use
+    return query.order_by(column.is_(None), key, direction_func(Book.id))
+
+def encode_cursor(sort: str, book: Book) -> str:
+    column, _ = sort_spec(sort)
+    value = getattr(book, column.key) if column is not None else None
+    if isinstance(value, date):
+        value = value.isoformat()
+    raw = json.dumps([value, book.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(sort: str, cursor: str):
+    """Return (value, id) of the last row on the previous page.  Raises ValueError if malformed."""
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # Every sort column holds text or ISO dates, so anything else was not written by encode_cursor()
+    if not isinstance(last_id, int) or not isinstance(value, (str, type(None))):
+        raise ValueError("Invalid cursor")
+    column, _ = sort_spec(sort)
+    if value is not None and column in DATE_COLUMNS:
+        try:
+            value = date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    return value, last_id
+
+def apply_cursor(query, sort: str, cursor: str):
+    """Keep only rows that come after the cursor in apply_sort() order."""
+    column, descending = sort_spec(sort)
+    value, last_id = decode_cursor(sort, cursor)
+    id_after = Book.id < last_id if descending else Book.id > last_id
+    if column is None:
+        return query.where(id_after)
+    key = _sort_key(column)
+    if not column.nullable:
+        # A row-value comparison lets SQLite seek straight to the cursor
+        pair, last = tuple_(key, Book.id), tuple_(value, last_id)
+        return query.where(pair < last if descending else pair > last)
+    if value is None:
+        # The cursor is already inside the trailing block of NULLs
+        return query.where(and_(column.is_(None), id_after))
+    beyond = key < value if descending else key > value
+    return query.where(or_(column.is_(None), beyond, and_(key == value, id_after)))
+
+async def get_books_page(db: AsyncSession, sort: str = "title_asc", cursor: Optional[str] = None,
+                         page_size: int = DEFAULT_PAGE_SIZE, **filters) -> Tuple[List[Book], Optional[str], int]:
+    """
+    One keyset-paginated page of the collection.
+
+    Returns (books, next_cursor, total) where next_cursor is None on the
+    last page and total counts every row matching the filters.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    query = apply_sort(apply_filters(select(Book), **filters), sort)
+    if cursor:
+        query = apply_cursor(query, sort, cursor)
+    books = (await db.execute(query.limit(page_size + 1))).scalars().all()
+
+    next_cursor = None
+    if len(books) > page_size:
+        books = books[:page_size]
+        next_cursor = encode_cursor(sort, books[-1])
+
+    total = (await db.execute(apply_filters(select(func.count(Book.id)), **filters))).scalar_one()
+    return books, next_cursor, total
+
+async def stream_book_rows(db: AsyncSession, sort: str = "title_asc", batch_size: int = 1000, **filters):
+    """
+    Yield every matching row, as lists of plain tuples in listing order.
+
+    Rows come through a server-side cursor ``batch_size`` at a time, so
+    memory stays flat however large the collection is.
+    """
+    query = apply_sort(apply_filters(select(*STORED_COLUMNS), **filters), sort)
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
 
 async def get_books(db: AsyncSession, q: str = "") -> List[Book]:
-    stmt = select(Book) if not q else select(Book).where(or_(
-        Book.title.ilike(f"%{q}%"),
-        Book.author.ilike(f"%{q}%"),
-        Book.isbn13 == q,
-        Book.isbn10 == q,
-        Book.lccn == q
-    ))
-    result = await db.execute(stmt)
+    if q:
+        return await search_books(db, q)
+    result = await db.execute(select(Book))
     return result.scalars().all()
 
 async def get_book(db: AsyncSession, book_id: int) -> Optional[Book]:
@@ -30,22 +203,42 @@ async def find_book_by_isbn(db: AsyncSession, isbn13: str = None, isbn10: str =
         return None
     return result.scalar_one_or_none()
 
+def _with_both_isbns(values: dict) -> dict:
+    """Fill in whichever ISBN form is missing so a match on either column is caught."""
+    try:
+        if values.get("isbn13") and not values.get("isbn10"):
+            values["isbn10"] = to_isbn10(values["isbn13"])
+        elif values.get("isbn10") and not values.get("isbn13"):
+            values["isbn13"] = to_isbn13(values["isbn10"])
+    except ValueError:
+        pass  # invalid ISBNs are stored as given
+    return values
+
 async def add_copy_or_create(db: AsyncSession, book_data: BookCreate) -> Book:
-    """Add a copy if book exists by ISBN, otherwise create new"""
-    existing = await find_book_by_isbn(db, book_data.isbn13, book_data.isbn10)
-
-    if existing:
-        existing.copies += 1
-        await db.commit()
-        await db.refresh(existing)
-        return existing
-    else:
-        new_book = Book(**book_data.model_dump(exclude_unset=True))
-        new_book.copies = 1
-        db.add(new_book)
-        await db.commit()
-        await db.refresh(new_book)
-        return new_book
+    """
+    Add a copy if book exists by ISBN, otherwise create new.
+
+    One INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement, so two
+    concurrent adds of the same book can't lose an increment or trip the
+    unique constraint.  A clash on either isbn13 or isbn10 counts as a match.
+    """
+    values = _with_both_isbns(book_data.model_dump(exclude_unset=True))
+    values["copies"] = 1
+    table = Book.__table__
+    # Named RETURNING columns: a database upgraded in place keeps its own
+    # physical column order, so * would not line up with the model.  Typed
+    # bind parameters so dates and prices go through SQLAlchemy's conversion.
+    upsert = text(f"""
+        INSERT INTO books ({", ".join(values)}) VALUES ({", ".join(":" + c for c in values)})
+        ON CONFLICT (isbn13) DO UPDATE SET copies = copies + 1
+        ON CONFLICT (isbn10) DO UPDATE SET copies = copies + 1
+        RETURNING {", ".join(c.name for c in table.columns)}
+    """).bindparams(*(bindparam(c, type_=table.c[c].type) for c in values)).columns(*table.columns)
+    result = await db.execute(
+        select(Book).from_statement(upsert).execution_options(populate_existing=True), values)
+    book = result.scalar_one()
+    await db.commit()
+    return book
 
 async def update_book(db: AsyncSession, book_id: int, book_data: BookCreate):
     await db.execute(
@@ -59,3 +252,29 @@ async def delete_book(db: AsyncSession, book_id: int):
     await db.execute(delete(Book).where(Book.id == book_id))
     await db.commit()
 
+
+async def merge_books(db: AsyncSession, keep_id: int, merge_ids: List[int]) -> Optional[Book]:
+    """
+    Fold duplicate entries into ``keep_id``: copies are summed, and fields the
+    kept book lacks are taken from the others in the order given.  The other
+    entries are deleted, all in one transaction.
+    """
+    merge_ids = [i for i in dict.fromkeys(merge_ids) if i != keep_id]
+    books = {b.id: b for b in (await db.execute(
+        select(Book).where(Book.id.in_([keep_id, *merge_ids])))).scalars()}
+    keep = books.get(keep_id)
+    if keep is None:
+        return None
+    others = [books[i] for i in merge_ids if i in books]
+    values = {"copies": keep.copies + sum(b.copies for b in others)}
+    for column in STORED_COLUMNS:
+        if column.name in ("id", "copies") or getattr(keep, column.name) not in (None, ""):
+            continue
+        value = next((getattr(b, column.name) for b in others if getattr(b, column.name) not in (None, "")), None)
+        if value is not None:
+            values[column.name] = value
+    # Delete first: a unique ISBN moving to the kept book must not clash with its old row
+    await db.execute(delete(Book).where(Book.id.in_([b.id for b in others])))
+    await db.execute(update(Book).where(Book.id == keep_id).values(**values))
+    await db.commit()
+    return await db.get(Book, keep_id, populate_existing=True)
@@ -0,0 +1,75 @@
+# crud/search.py — SQLite FTS5 full-text search over the books table
+import re
+from typing import List
+
+from sqlalchemy import select, text, column, Integer, Float
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
+
+from models import Book
+
+# External-content table: the text lives only in books, books_fts holds the index.
+# bm25 weights follow the column order: title, author, description, comment.
+FTS_COLUMNS = ["title", "author", "description", "comment"]
+BM25_WEIGHTS = "10.0, 5.0, 1.0, 1.0"
+
+FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        {", ".join(FTS_COLUMNS)},
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, {", ".join(FTS_COLUMNS)})
+        VALUES (new.id, {", ".join("new." + c for c in FTS_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, {", ".join(FTS_COLUMNS)})
+        VALUES ('delete', old.id, {", ".join("old." + c for c in FTS_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF {", ".join(FTS_COLUMNS)} ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, {", ".join(FTS_COLUMNS)})
+        VALUES ('delete', old.id, {", ".join("old." + c for c in FTS_COLUMNS)});
+        INSERT INTO books_fts(rowid, {", ".join(FTS_COLUMNS)})
+        VALUES (new.id, {", ".join("new." + c for c in FTS_COLUMNS)});
+    END""",
+]
+
+async def rebuild_search_index(conn: AsyncConnection) -> int:
+    """Re-index every row from books.  Returns the number of indexed rows."""
+    await conn.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+    return (await conn.execute(text("SELECT count(*) FROM books"))).scalar_one()
+
+def fts_query(q: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, each as a prefix.
+
+    Words are quoted so FTS5 operators or punctuation typed by the user
+    can't produce a syntax error.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", q))
+
+async def search_books(db: AsyncSession, q: str, limit: int = 50) -> List[Book]:
+    """Best matches first (bm25).  Exact ISBN/LCCN matches are listed ahead of text matches."""
+    q = q.strip()
+    if not q:
+        return []
+    exact = (await db.execute(select(Book).where(
+        (Book.isbn13 == q) | (Book.isbn10 == q) | (Book.lccn == q)))).scalars().all()
+
+    match = fts_query(q)
+    if not match:
+        return list(exact)
+    # Rank ids in the index, then load the rows by name: books.* would be
+    # mapped by position, and upgraded databases order their columns differently
+    ranked_ids = text(f"""
+        SELECT rowid AS id, bm25(books_fts, {BM25_WEIGHTS}) AS rank FROM books_fts
+        WHERE books_fts MATCH :match
+        ORDER BY rank
+        LIMIT :limit
+    """).columns(column("id", Integer), column("rank", Float)).subquery()
+    ranked = (await db.execute(
+        select(Book).join(ranked_ids, Book.id == ranked_ids.c.id).order_by(ranked_ids.c.rank),
+        {"match": match, "limit": limit})).scalars().all()
+    seen = {b.id for b in exact}
+    return list(exact) + [b for b in ranked if b.id not in seen]
@@ -0,0 +1,117 @@
+# crud/stats.py — collection statistics from a trigger-maintained summary table
+#
+# stats_summary holds one row per (dimension, bucket): how many books fall
+# in it, their copies, pages and purchase prices.  Triggers on books add a
+# row's contribution on insert, subtract it on delete, and do both on an
+# update of any column a dimension depends on, so /stats reads a few hundred
+# rows instead of grouping the whole books table on every view.
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# dimension -> bucket expression over a books row; {r} is new, old or books.
+# A NULL bucket means the row doesn't count in that dimension.
+DIMENSIONS = {
+    "total": "'all'",
+    "read_month": "strftime('%Y-%m', {r}.date_read)",
+    "publisher": "coalesce(nullif(trim({r}.publisher), ''), '(none)')",
+    "format": "coalesce(nullif({r}.book_format_norm, ''), '(none)')",
+    "daw_range": "CASE WHEN {r}.daw_book_number > 0 THEN printf('%04d-%04d', "
+                 "({r}.daw_book_number - 1) / 100 * 100 + 1, ({r}.daw_book_number - 1) / 100 * 100 + 100) END",
+}
+# The columns the bucket expressions and the measures read
+WATCHED_COLUMNS = ["copies", "pages", "purchase_price", "date_read", "publisher", "book_format", "daw_book_number"]
+# Measures per row; prices are summed as integer cents so the totals never drift
+MEASURES = {
+    "books": "1",
+    "copies": "{r}.copies",
+    "pages": "coalesce({r}.pages, 0)",
+    "priced": "{r}.purchase_price IS NOT NULL",
+    "spend_cents": "coalesce(CAST(round({r}.purchase_price * 100) AS INTEGER), 0)",
+}
+
+
+def _apply(row: str, sign: str) -> List[str]:
+    """One upsert per dimension adding (sign '+') or removing (sign '-') ``row``'s contribution."""
+    columns = ", ".join(MEASURES)
+    statements = []
+    for dimension, bucket in DIMENSIONS.items():
+        bucket = bucket.format(r=row)
+        values = ", ".join(f"{sign}({m.format(r=row)})" for m in MEASURES.values())
+        updates = ", ".join(f"{m} = {m} + excluded.{m}" for m in MEASURES)
+        statements.append(f"""
+        INSERT INTO stats_summary (dimension, bucket, {columns})
+        SELECT '{dimension}', {bucket}, {values} WHERE {bucket} IS NOT NULL
+        ON CONFLICT (dimension, bucket) DO UPDATE SET {updates};""")
+    return statements
+
+
+_PRUNE = "\n        DELETE FROM stats_summary WHERE books = 0;"
+
+STATS_DDL = [
+    """CREATE TABLE IF NOT EXISTS stats_summary (
+        dimension VARCHAR NOT NULL,
+        bucket VARCHAR NOT NULL,
+        books INTEGER NOT NULL,
+        copies INTEGER NOT NULL,
+        pages INTEGER NOT NULL,
+        priced INTEGER NOT NULL,
+        spend_cents INTEGER NOT NULL,
+        PRIMARY KEY (dimension, bucket)
+    ) WITHOUT ROWID""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_stats_ai AFTER INSERT ON books BEGIN{"".join(_apply("new", "+"))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_stats_ad AFTER DELETE ON books BEGIN{"".join(_apply("old", "-"))}{_PRUNE}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_stats_au AFTER UPDATE OF {", ".join(WATCHED_COLUMNS)} ON books
+    BEGIN{"".join(_apply("old", "-"))}{"".join(_apply("new", "+"))}{_PRUNE}
+    END""",
+]
+
+RECOMPUTE_SQL = " UNION ALL ".join(
+    f"SELECT '{dimension}' AS dimension, {bucket.format(r='books')} AS bucket, "
+    + ", ".join(f"sum({m.format(r='books')}) AS {name}" for name, m in MEASURES.items())
+    + f" FROM books WHERE {bucket.format(r='books')} IS NOT NULL GROUP BY 2"
+    for dimension, bucket in DIMENSIONS.items()
+)
+
+
+async def rebuild_stats(conn: AsyncConnection) -> int:
+    """Recompute the summary from books.  Returns the number of summary rows."""
+    await conn.execute(text("DELETE FROM stats_summary"))
+    await conn.execute(text(f"INSERT INTO stats_summary (dimension, bucket, {', '.join(MEASURES)}) {RECOMPUTE_SQL}"))
+    return (await conn.execute(text("SELECT count(*) FROM stats_summary"))).scalar_one()
+
+
+async def check_stats(conn: AsyncConnection) -> List[Dict]:
+    """
+    Compare the summary with a from-scratch recomputation.  Returns the rows
+    that differ, each with the stored and expected values (None if missing).
+    """
+    columns = ["dimension", "bucket", *MEASURES]
+    stored = {(r[0], r[1]): tuple(r[2:]) for r in
+              await conn.execute(text(f"SELECT {', '.join(columns)} FROM stats_summary"))}
+    expected = {(r[0], r[1]): tuple(r[2:]) for r in await conn.execute(text(RECOMPUTE_SQL))}
+    return [{"dimension": key[0], "bucket": key[1],
+             "stored": dict(zip(MEASURES, stored[key])) if key in stored else None,
+             "expected": dict(zip(MEASURES, expected[key])) if key in expected else None}
+            for key in sorted(stored.keys() | expected.keys())
+            if stored.get(key) != expected.get(key)]
+
+
+async def get_stats(conn: AsyncConnection) -> Dict[str, List[Dict]]:
+    """Every dimension's buckets, in bucket order; prices in dollars."""
+    stats: Dict[str, List[Dict]] = {dimension: [] for dimension in DIMENSIONS}
+    rows = await conn.execute(text(f"SELECT dimension, bucket, {', '.join(MEASURES)} "
+                                   "FROM stats_summary ORDER BY dimension, bucket"))
+    for dimension, bucket, books, copies, pages, priced, spend_cents in rows:
+        stats.setdefault(dimension, []).append({
+            "bucket": bucket,
+            "books": books,
+            "copies": copies,
+            "pages": pages,
+            "priced": priced,
+            "spend": spend_cents / 100,
+        })
+    return stats
@@ -1,130 +1,185 @@
 # main.py — FINAL, WORKING with triple lookup + proper error handling
-from fastapi import FastAPI, Form, Request, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+import asyncio
+import csv
+import io
+import json
+import time
+
+from typing import List
+
+from fastapi import FastAPI, Form, Request, Depends, HTTPException, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, Response, StreamingResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, update, delete, text, asc, desc, case
-from database import init_db, get_db
-from crud.book import get_books, add_copy_or_create, get_book, update_book, delete_book
+from sqlalchemy import select, or_, update, delete, text
+from database import init_db, get_db, get_read_db, AsyncSessionLocal, ReadSessionLocal, engine, read_engine
+from crud.book import (
+    get_books, add_copy_or_create, get_book, update_book, delete_book,
+    get_books_page, stream_book_rows, apply_filters, book_filters, merge_books, DEFAULT_PAGE_SIZE, STORED_COLUMNS
+    )
+from crud.search import search_books
+from crud.stats import get_stats
 from services.google_books import (
-    openlibrary_lookup, google_lookup, isbndb_lookup,
+    PROVIDERS, lookup_all, collect_late, provider_status,
     merge_results
     )
-from schemas import BookCreate
+from services.importer import import_books
+from services import enrichment, covers, metrics, dedupe, jobs
+import api_v1
+from services.http_client import start_client, close_client
+from services.lookup_cache import lookup_cache
+from services.page_cache import page_cache
+from schemas import BookCreate, IsbnBatch
 from models import Book
 from services.isbn_utils import is_valid, to_isbn10, to_isbn13
+from services.isbn_batch import normalize_batch
 
 app = FastAPI(title="BookTracker")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["cover_key"] = covers.cover_key
+
+def book_row(book: Book, generation: int) -> Markup:
+    """One book's table row, rendered from _book_row.html or reused from the fragment cache."""
+    row = templates.get_template("_book_row.html")
+    return Markup(page_cache.fragment(book.id, generation, lambda: row.render(book=book)))
+
+templates.env.globals["book_row"] = book_row
+
+app.include_router(api_v1.router)
+
+async def schedule_dedupe():
+    # Index books added while the server was down, e.g. by `manage.py import`
+    async with AsyncSessionLocal() as db:
+        await dedupe.schedule_refresh(db)
 
 app.add_event_handler("startup", init_db)
+app.add_event_handler("startup", start_client)
+app.add_event_handler("startup", jobs.start_workers)
+app.add_event_handler("startup", schedule_dedupe)
+app.add_event_handler("shutdown", jobs.stop_workers)
+app.add_event_handler("shutdown", close_client)
+
+metrics.instrument_engine(engine)
+metrics.instrument_engine(read_engine)
+
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.request_duration.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=str(response.status_code),
+    )
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Request, SQL and provider metrics in Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def home(
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     sort: str = "title_asc",          # default sort
-    format: str | None = None,        # filter by format
-    publisher: str | None = None,     # filter by publisher
-    date_read_from: str | None = None,
-    date_read_to: str | None = None,
-    date_purchased_from: str | None = None,
-    date_purchased_to: str | None = None,
+    filters: dict = Depends(book_filters),
+    cursor: str | None = None,        # keyset position from the previous page's "Next" link
+    page_size: int = DEFAULT_PAGE_SIZE,
 ):
-    # Build the query
-    query = select(Book)
-
-    # Apply filters
-    if format:
-        query = query.where(Book.book_format.ilike(f"%{format}%"))  # partial match ok for now
-    if publisher:
-        query = query.where(Book.publisher.ilike(f"%{publisher}%"))
-
-    if date_read_from:
-        query = query.where(Book.date_read >= date_read_from)
-    if date_read_to:
-        query = query.where(Book.date_read <= date_read_to)
-
-    if date_purchased_from:
-        query = query.where(Book.date_purchased >= date_purchased_from)
-    if date_purchased_to:
-        query = query.where(Book.date_purchased <= date_purchased_to)
-
-    # Apply sorting
-    sort_column = Book.id  # default
-    direction_func = desc
-
-    match sort:
-        case "title_asc":
-            sort_column = Book.title
-            direction_func = asc
-        case "title_desc":
-            sort_column = Book.title
-            direction_func = desc
-        case "author_asc":
-            sort_column = Book.author
-            direction_func = asc
-        case "author_desc":
-            sort_column = Book.author
-            direction_func = desc
-        case "date_read_asc":
-            sort_column = Book.date_read
-            direction_func = asc
-        case "date_read_desc":
-            sort_column = Book.date_read
-            direction_func = desc
-        case "date_purchased_asc":
-            sort_column = Book.date_purchased
-            direction_func = asc
-        case "date_purchased_desc":
-            sort_column = Book.date_purchased
-            direction_func = desc
-        case "publisher_asc":
-            sort_column = Book.publisher
-            direction_func = asc
-        case "publisher_desc":
-            sort_column = Book.publisher
-            direction_func = desc
-        case "format_asc":
-            sort_column = Book.book_format
-            direction_func = asc
-        case "format_desc":
-            sort_column = Book.book_format
-            direction_func = desc
-        case _:
-            sort_column = Book.id
-            direction_func = desc
-
-    # SQLite-compatible: NULLs last using CASE
-    nulls_last = case(
-        (sort_column.is_(None), 1),
-        else_=0
-    )
-
-    if direction_func == desc:
-        # For descending: sort column descending first, then nulls (which get 1 → come last)
-        sort_expr = desc(sort_column), nulls_last
-    else:
-        # For ascending: sort column ascending first, then nulls (which get 1 → come last)
-        sort_expr = sort_column, nulls_last
-
-    query = query.order_by(*sort_expr)
-
-    result = await db.execute(query)
-    books = result.scalars().all()
-
+    # Read before querying, so a write during the render can't be cached as current
+    generation = await page_cache.current_generation()
+    headers = {"ETag": page_cache.etag(generation), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        metrics.page_cache.inc(kind="page", outcome="not_modified")
+        return Response(status_code=304, headers=headers)
+
+    key = str(request.url)
+    body = await page_cache.get_page(key, generation)
+    if body is None:
+        try:
+            books, next_cursor, total = await get_books_page(
+                db, sort=sort, cursor=cursor, page_size=page_size, **filters)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+        body = templates.TemplateResponse("home.html", {
+            "request": request,
+            "books": books,
+            "cache_generation": generation,
+            "total": total,
+            "page_size": page_size,
+            "next_url": request.url.include_query_params(cursor=next_cursor) if next_cursor else None,
+            "first_url": request.url.remove_query_params("cursor") if cursor else None,
+            "export_query": request.url.remove_query_params(["cursor", "page_size"]).query,
+            "current_sort": sort,
+            "current_format": filters["format"],
+            "current_publisher": filters["publisher"],
+            "date_read_from": filters["date_read_from"],
+            "date_read_to": filters["date_read_to"],
+            "date_purchased_from": filters["date_purchased_from"],
+            "date_purchased_to": filters["date_purchased_to"],
+        }).body
+        await page_cache.put_page(key, generation, body)
+    return HTMLResponse(body, headers=headers)
+
+EXPORT_COLUMNS = [column.name for column in STORED_COLUMNS]
+
+def _export(sort: str, filters: dict, encode_rows, media_type: str, filename: str, header: str = ""):
+    """
+    Stream the whole filtered, sorted listing.  The session is opened inside
+    the generator because it has to outlive the request handler.
+    """
+    try:
+        apply_filters(select(Book), **filters)  # reject bad filter values before the 200 goes out
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    async def body():
+        if header:
+            yield header
+        async with ReadSessionLocal() as db:
+            async for rows in stream_book_rows(db, sort=sort, **filters):
+                yield encode_rows(rows)
+
+    return StreamingResponse(body(), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def _csv_lines(rows) -> str:
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue()
+
+def _csv_header() -> str:
+    return _csv_lines([EXPORT_COLUMNS])
+
+def _jsonl_lines(rows) -> str:
+    return "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n" for row in rows)
+
+@app.get("/export.csv")
+async def export_csv(sort: str = "title_asc", filters: dict = Depends(book_filters)):
+    return _export(sort, filters, _csv_lines, "text/csv", "books.csv", header=_csv_header())
+
+@app.get("/export.jsonl")
+async def export_jsonl(sort: str = "title_asc", filters: dict = Depends(book_filters)):
+    return _export(sort, filters, _jsonl_lines, "application/x-ndjson", "books.jsonl")
+
+@app.get("/search")
+async def search(request: Request, q: str = "", limit: int = 50, db: AsyncSession = Depends(get_read_db)):
+    """Full-text search over title, author, description and comment, best matches first."""
+    generation = await page_cache.current_generation()
+    books = await search_books(db, q, limit=max(1, min(limit, 500)))
     return templates.TemplateResponse("home.html", {
         "request": request,
         "books": books,
-        "current_sort": sort,
-        "current_format": format,
-        "current_publisher": publisher,
-        "date_read_from": date_read_from,
-        "date_read_to": date_read_to,
-        "date_purchased_from": date_purchased_from,
-        "date_purchased_to": date_purchased_to,
+        "cache_generation": generation,
+        "total": len(books),
+        "current_q": q,
     })
 
 @app.get("/add", response_class=HTMLResponse)
@@ -140,57 +195,60 @@ async def add_book(
     author: str = Form(""),
     isbn: str = Form(""),
     lccn: str = Form(""),
-    lookup: bool = Form(True),
+    do_lookup: bool = Form(True, alias="lookup"),
     db: AsyncSession = Depends(get_db),
     request: Request = None
 ):
-    # Validate ISBN if provided
-    if isbn.strip():
+    """
+    Save the book right away; metadata is looked up by a background job
+    (services/jobs.py) so the response never waits on the providers.
+    """
+    cleaned_isbn = isbn.replace("-", "").replace(" ", "").upper()
+    if cleaned_isbn:
         try:
-            cleaned_isbn = is_valid(isbn)  # your function — raises ValueError if invalid
+            valid = is_valid(cleaned_isbn)
         except ValueError as e:
+            valid, message = False, str(e)
+        else:
+            message = "Invalid ISBN — please check and try again"
+        if not valid:
             return templates.TemplateResponse("add.html", {
                 "request": request,
                 "query": {"title": title, "author": author, "isbn": isbn, "lccn": lccn},
-                "error": str(e)  # shows "Invalid ISBN — please check and try again"
+                "error": message,
             })
-    else:
-        cleaned_isbn = ""
-
-    # Proceed with lookup if requested and valid
-    if lookup and cleaned_isbn:
-        gdata = await lookup(isbn=cleaned_isbn)
-        if gdata:
-            title = gdata["title"]
-            author = gdata["author"]
-            isbn13 = gdata["isbn13"]
-            isbn10 = gdata["isbn10"]
-            description = gdata["description"]
-            cover_url = gdata["cover_url"]
-        else:
-            isbn13 = isbn10 = description = cover_url = None
-    else:
-        isbn13 = isbn10 = description = cover_url = None
-
-    # Derive missing format
-    if cleaned_isbn:
-        if len(cleaned_isbn) == 13 and not isbn10:
-            isbn10 = to_isbn10(cleaned_isbn)
-        elif len(cleaned_isbn) == 10 and not isbn13:
-            isbn13 = to_isbn13(cleaned_isbn)
 
     book_data = BookCreate(
         title=title or "Untitled",
         author=author or "Unknown",
-        isbn13=isbn13,
-        isbn10=isbn10,
+        isbn13=to_isbn13(cleaned_isbn, validate=False) if cleaned_isbn else None,
+        isbn10=to_isbn10(cleaned_isbn, validate=False) if cleaned_isbn else None,
         lccn=lccn or None,
-        description=description,
-        cover_url=cover_url
     )
-    await add_copy_or_create(db, book_data)
+    book = await add_copy_or_create(db, book_data)
+    await page_cache.invalidate(book.id)
+    await dedupe.schedule_refresh(db)
+    if do_lookup and book.isbn13:
+        await jobs.enqueue(db, "enrich", book.isbn13, book_id=book.id)
     return RedirectResponse("/", status_code=303)
 
+@app.get("/books/{book_id}/jobs")
+async def book_jobs(book_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Background jobs for a book (metadata lookups), newest first."""
+    return await jobs.job_status(db, book_id)
+
+@app.get("/jobs")
+async def job_queue(db: AsyncSession = Depends(get_read_db)):
+    """Job counts by status."""
+    return await jobs.queue_summary(db)
+
+# Lookup page panes, in display order
+PROVIDER_LABELS = {"openlibrary": "Open Library", "google": "Google Books", "isbndb": "ISBNdb"}
+
+def _provider_pane(name: str, result=None, pending_url: str | None = None) -> dict:
+    return {"name": name, "label": PROVIDER_LABELS[name], "result": result or {},
+            "enabled": PROVIDERS[name].enabled(), "pending_url": pending_url}
+
 @app.post("/lookup", response_class=HTMLResponse)
 async def lookup_books(
     title: str = Form(""),
@@ -198,29 +256,72 @@ async def lookup_books(
     isbn: str = Form(""),
     lccn: str = Form(""),
     request: Request = None,
-    db: AsyncSession = Depends(get_db)
 ):
-    from asyncio import gather
-
-    # Run all three lookups in parallel
-    openlib, google, isbndb = await gather(
-        openlibrary_lookup(isbn=isbn.strip()),
-        google_lookup(isbn=isbn.strip()),
-        isbndb_lookup(isbn=isbn.strip())
-    )
+    # All three providers in parallel; ones that miss the deadline are loaded
+    # into the page afterwards from /lookup/pending
+    results, token = await lookup_all(isbn.strip())
+
+    panes = []
+    for name in PROVIDER_LABELS:
+        pending_url = None
+        if name not in results:
+            pending_url = request.url_for("lookup_pending", token=token, provider=name).include_query_params(
+                isbn=isbn.strip())
+        panes.append(_provider_pane(name, results.get(name), pending_url))
 
     # Merge for the synthesis pane
-    synthesis = merge_results(openlib, google, isbndb)
+    synthesis = merge_results(results.get("openlibrary"), results.get("google"), results.get("isbndb"))
 
     return templates.TemplateResponse("lookup.html", {
         "request": request,
-        "openlib": openlib or {},
-        "google": google or {},
-        "isbndb": isbndb or {},
+        "panes": panes,
         "synthesis": synthesis,
         "query": {"title": title, "author": author, "isbn": isbn, "lccn": lccn}
     })
 
+@app.get("/lookup/pending/{token}/{provider}", response_class=HTMLResponse)
+async def lookup_pending(token: str, provider: str, isbn: str, request: Request):
+    """The pane of a provider that missed the /lookup deadline, once it has answered."""
+    if provider not in PROVIDER_LABELS:
+        raise HTTPException(404, "Unknown provider")
+    result = await collect_late(token, provider, isbn)
+    return templates.TemplateResponse("_provider_pane.html", {
+        "request": request,
+        "pane": _provider_pane(provider, result),
+    })
+
+@app.get("/lookup/providers")
+async def lookup_provider_status():
+    """Circuit breaker state and adaptive timeout of each provider."""
+    return provider_status()
+
+@app.get("/lookup/cache")
+async def lookup_cache_stats():
+    """Hit/miss counters for the provider lookup cache."""
+    return await asyncio.to_thread(lookup_cache.stats)
+
+MAX_ISBN_BATCH = 100_000
+
+@app.post("/isbn/batch")
+async def isbn_batch(batch: IsbnBatch):
+    """
+    Validate and convert up to MAX_ISBN_BATCH ISBNs in one call.  Every item
+    gets a result; invalid ones carry an error code and message instead.
+    """
+    if len(batch.isbns) > MAX_ISBN_BATCH:
+        raise HTTPException(413, f"At most {MAX_ISBN_BATCH} ISBNs per batch")
+    result = normalize_batch(batch.isbns)
+    return {
+        "valid": result.errors.count(0),
+        "results": [{
+            "input": raw,
+            "isbn13": result.isbn13[i],
+            "isbn10": result.isbn10[i],
+            "error": result.errors[i],
+            "message": result.message(i),
+        } for i, raw in enumerate(batch.isbns)],
+    }
+
 @app.post("/add_selected")
 async def add_selected(
     title: str = Form(...),
@@ -248,12 +349,12 @@ async def add_selected(
 
     # Derive the other format if only one is present and valid
     if isbn13_clean and not isbn10_clean:
-        derived = to_isbn10(isbn13_clean)
+        derived = to_isbn10(isbn13_clean, validate=False)
         if derived:
             isbn10_clean = derived
 
     if isbn10_clean and not isbn13_clean:
-        derived = to_isbn13(isbn10_clean)
+        derived = to_isbn13(isbn10_clean, validate=False)
         if derived:
             isbn13_clean = derived
 
@@ -268,6 +369,8 @@ async def add_selected(
     )
 
     result_book = await add_copy_or_create(db, book_data)
+    await page_cache.invalidate(result_book.id)
+    await dedupe.schedule_refresh(db)
 
     if result_book.copies > 1:
         return HTMLResponse(f"""
@@ -278,12 +381,62 @@ async def add_selected(
 
     return RedirectResponse("/", status_code=303)
 
+@app.post("/import")
+async def import_upload(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    """Bulk import an uploaded CSV, Goodreads or LibraryThing export."""
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    report = await import_books(db, stream)
+    await page_cache.invalidate()
+    await dedupe.schedule_refresh(db)
+    return report.summary()
+
+@app.get("/pages/cache")
+async def page_cache_stats():
+    """Generation and entry counts of the rendered page cache."""
+    return await page_cache.stats()
+
+@app.post("/enrich")
+async def start_enrichment(restart: bool = False):
+    """Start filling in missing covers, descriptions, publishers and page counts in the background."""
+    started = enrichment.start(restart=restart)
+    return {"started": started, **enrichment.job.status()}
+
+@app.get("/enrich")
+async def enrichment_status():
+    return enrichment.job.status()
+
+@app.get("/covers/{book_id}")
+async def cover_image(book_id: int, request: Request, size: str = "thumb", db: AsyncSession = Depends(get_read_db)):
+    """
+    A book's cover from the local cache, fetched once from cover_url.
+
+    Links carry ?v=<cover_key> so the response can be cached for a year;
+    a changed cover_url gets a new key and therefore a new URL.
+    """
+    cover_url = (await db.execute(select(Book.cover_url).where(Book.id == book_id))).scalar_one_or_none()
+    etag = f'"{covers.cover_key(cover_url)}-{size}"'
+    if cover_url and request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    path = await covers.get_cover(cover_url, size)
+    if path is None:
+        # Short-lived so a cover that failed to download is retried soon
+        return FileResponse(covers.NO_COVER, headers={"Cache-Control": "public, max-age=300"})
+    return FileResponse(path, media_type=covers.media_type(path), headers={
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    })
+
 @app.get("/edit/{book_id}", response_class=HTMLResponse)
-async def edit_form(book_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+async def edit_form(book_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
     book = await get_book(db, book_id)
     if not book:
         raise HTTPException(404, "Book not found")
-    return templates.TemplateResponse("edit.html", {"request": request, "book": book})
+    return templates.TemplateResponse("edit.html", {
+        "request": request,
+        "book": book,
+        "jobs": await jobs.job_status(db, book_id),
+    })
 
 @app.post("/edit/{book_id}")
 async def update_book_route(
@@ -344,10 +497,53 @@ async def update_book_route(
     }
     await db.execute(update(Book).where(Book.id == book_id).values(**book_data))
     await db.commit()
+    await page_cache.invalidate(book_id)
+    await dedupe.schedule_refresh(db)  # the title and author were rewritten, which drops the book's keys
     return RedirectResponse("/", status_code=303)
 
 @app.post("/delete/{book_id}")
 async def delete_book_route(book_id: int, db: AsyncSession = Depends(get_db)):
     await delete_book(db, book_id)
+    await page_cache.invalidate(book_id)
     return RedirectResponse("/", status_code=303)
 
+
+@app.get("/duplicates", response_class=HTMLResponse)
+async def duplicates(request: Request, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
+    """Likely duplicate entries, grouped, for review.  Books still waiting for the "dedupe" job are counted, not matched."""
+    started = time.perf_counter()
+    groups = await dedupe.find_duplicates(db)
+    shown = groups[:max(1, limit)]
+    ids = {i for group in shown for i in group.book_ids}
+    books = {b.id: b for b in (await db.execute(select(Book).where(Book.id.in_(ids)))).scalars()}
+    return templates.TemplateResponse("duplicates.html", {
+        "request": request,
+        "groups": [(group, [books[i] for i in group.book_ids if i in books]) for group in shown],
+        "total": len(groups),
+        "unindexed": await dedupe.unindexed(db),
+        "elapsed": time.perf_counter() - started,
+    })
+
+@app.post("/duplicates/merge")
+async def merge_duplicates(keep: int = Form(...), book_ids: List[int] = Form(...), db: AsyncSession = Depends(get_db)):
+    """Merge a group into the book chosen to keep; copies are summed."""
+    if await merge_books(db, keep, book_ids) is None:
+        raise HTTPException(404, "Book not found")
+    await page_cache.invalidate(keep, *book_ids)
+    return RedirectResponse("/duplicates", status_code=303)
+
+@app.post("/duplicates/dismiss")
+async def dismiss_duplicates(book_ids: List[int] = Form(...), db: AsyncSession = Depends(get_db)):
+    """Mark a group as not duplicates, so it isn't suggested again."""
+    await dedupe.dismiss(db, book_ids)
+    return RedirectResponse("/duplicates", status_code=303)
+
+@app.get("/stats", response_class=HTMLResponse)
+async def stats_page(request: Request, db: AsyncSession = Depends(get_read_db)):
+    stats = await get_stats(await db.connection())
+    return templates.TemplateResponse("stats.html", {"request": request, "stats": stats})
+
+@app.get("/stats.json")
+async def stats_json(db: AsyncSession = Depends(get_read_db)):
+    """Books read per month, and counts, pages and spend by publisher, format and DAW number range."""
+    return await get_stats(await db.connection())
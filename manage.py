@@ -0,0 +1,147 @@
+# manage.py — maintenance commands for the BookTracker database
+import argparse
+import asyncio
+
+from database import engine, init_db, AsyncSessionLocal
+from migrations import migrate, current_version, LATEST
+from crud.search import rebuild_search_index
+from crud.stats import rebuild_stats, check_stats
+from services.importer import import_books, DEFAULT_BATCH_SIZE
+from services.enrichment import EnrichmentJob, DEFAULT_CONCURRENCY
+from services import openlibrary_local, jobs, dedupe
+from services.http_client import close_client
+from services.page_cache import page_cache
+
+async def migrate_db(args):
+    def progress(migration, done, total):
+        print(f"\r  migration {migration.version}: backfilled up to id {done:,} of {total:,}",
+              end="\n" if done >= total else "", flush=True)
+
+    applied = await migrate(engine, progress=progress)
+    async with engine.connect() as conn:
+        version = await current_version(conn)
+    print(f"Schema at version {version} of {LATEST}; {len(applied)} migration(s) applied")
+
+async def rebuild_search(args):
+    await init_db()
+    async with engine.begin() as conn:
+        count = await rebuild_search_index(conn)
+    print(f"Search index rebuilt: {count} books indexed")
+
+async def rebuild_stats_cmd(args):
+    await init_db()
+    async with engine.begin() as conn:
+        count = await rebuild_stats(conn)
+    print(f"Statistics rebuilt: {count} summary rows")
+
+async def check_stats_cmd(args):
+    await init_db()
+    async with engine.connect() as conn:
+        differences = await check_stats(conn)
+    for d in differences:
+        print(f"  {d['dimension']} {d['bucket']!r}: stored {d['stored']}, expected {d['expected']}")
+    if differences:
+        print(f"{len(differences)} summary row(s) differ from a full recomputation")
+        raise SystemExit(1)
+    print("Statistics match a full recomputation")
+
+async def import_file(args):
+    await init_db()
+
+    def progress(report):
+        print(f"\r{report.rows:,} rows  {report.created:,} new  {report.copies_added:,} copies  "
+              f"{report.rate:,.0f} rows/s", end="", flush=True)
+
+    with open(args.path, encoding="utf-8-sig", newline="") as stream:
+        async with AsyncSessionLocal() as db:
+            report = await import_books(db, stream, batch_size=args.batch_size, progress=progress)
+            await dedupe.schedule_refresh(db)   # run by the server's job workers or `manage.py worker`
+    await page_cache.invalidate()
+    print()
+    for error in report.errors:
+        print(f"  error: {error}")
+    print(report.summary())
+
+async def enrich(args):
+    await init_db()
+    job = EnrichmentJob(concurrency=args.concurrency)
+
+    def progress(job):
+        status = job.status()
+        print(f"\r{status['processed']:,} checked  {status['updated']:,} updated  "
+              f"{status['books_per_second']} books/s  (last id {status['last_id']})", end="", flush=True)
+
+    await job.run(restart=args.restart, progress=progress)
+    print()
+    print(job.status())
+
+async def import_ol_dump(args):
+    def progress(report):
+        print(f"\r{report.lines:,} lines  {report.editions:,} editions  {report.authors:,} authors  "
+              f"{report.bytes_read / report.total_bytes:.0%} of file  {report.rate:,.0f} lines/s",
+              end="", flush=True)
+
+    for path in args.paths:
+        print(f"Importing {path} into {args.index}")
+        report = openlibrary_local.import_dump(path, args.index, batch_size=args.batch_size, progress=progress)
+        print()
+        print(report.summary())
+
+async def worker(args):
+    await init_db()
+    await jobs.start_workers(args.concurrency)
+    print(f"Running {args.concurrency} job worker(s); Ctrl-C to stop")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await jobs.stop_workers()
+        await close_client()
+
+def main():
+    parser = argparse.ArgumentParser(description="BookTracker maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("migrate", help="apply pending schema migrations")
+    cmd.set_defaults(func=migrate_db)
+
+    cmd = commands.add_parser("rebuild-search", help="rebuild the full-text search index from the books table")
+    cmd.set_defaults(func=rebuild_search)
+
+    cmd = commands.add_parser("rebuild-stats", help="recompute the collection statistics summary from the books table")
+    cmd.set_defaults(func=rebuild_stats_cmd)
+
+    cmd = commands.add_parser("check-stats", help="compare the statistics summary with a full recomputation")
+    cmd.set_defaults(func=check_stats_cmd)
+
+    cmd = commands.add_parser("import", help="bulk import a CSV, Goodreads or LibraryThing export")
+    cmd.add_argument("path")
+    cmd.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    cmd.set_defaults(func=import_file)
+
+    cmd = commands.add_parser("enrich", help="fill in missing metadata from the lookup providers (resumable)")
+    cmd.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first book")
+    cmd.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    cmd.set_defaults(func=enrich)
+
+    cmd = commands.add_parser("import-ol-dump",
+                              help="build the offline Open Library index from editions/authors dumps (.txt.gz)")
+    cmd.add_argument("paths", nargs="+")
+    cmd.add_argument("--index", default=openlibrary_local.INDEX_PATH)
+    cmd.add_argument("--batch-size", type=int, default=openlibrary_local.DEFAULT_BATCH_SIZE)
+    cmd.set_defaults(func=import_ol_dump)
+
+    cmd = commands.add_parser("worker", help="run background jobs (metadata lookups, duplicate-detection keys)")
+    cmd.add_argument("--concurrency", type=int, default=max(jobs.WORKERS, 1))
+    cmd.set_defaults(func=worker)
+
+    args = parser.parse_args()
+    # Writes made here reach a running server's page cache through books.db (services/page_cache.py)
+    page_cache.publish = True
+    try:
+        asyncio.run(args.func(args))
+    except KeyboardInterrupt:
+        pass
+    asyncio.run(engine.dispose())
+
+if __name__ == "__main__":
+    main()
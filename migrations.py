@@ -0,0 +1,210 @@
+# migrations.py — versioned schema migrations for books.db
+#
+# The schema_version table records every migration applied.  init_db() reads
+# its highest version once at startup and only does more work when that is
+# behind LATEST.  Each migration's schema change runs in a single
+# BEGIN IMMEDIATE transaction, which also keeps two processes from migrating
+# at once.  Work proportional to the size of books goes in a Backfill, run
+# in short id-range batches that each commit, so the write lock is never held
+# for long; progress is checkpointed in job_checkpoints so an interrupted
+# backfill resumes where it stopped.
+#
+# Migrations must be safe on databases that already have their change: the
+# baseline creates the current schema, and databases that predate this runner
+# were upgraded by hand (or by the old startup ALTERs) to varying degrees.
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from database import Base, refresh_statistics
+from models import Book, Job
+from crud.search import FTS_COLUMNS, FTS_DDL
+from crud.stats import STATS_DDL, rebuild_stats
+from services.dedupe import DDL as DEDUPE_DDL
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+@dataclass
+class Backfill:
+    """A statement over books run for :first_id..:last_id ranges, one transaction per batch."""
+    sql: str
+    batch_size: int = DEFAULT_BATCH_SIZE
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+    backfill: Optional[Backfill] = None
+
+
+async def _columns(conn: AsyncConnection, table: str) -> set:
+    return {row[1] for row in await conn.execute(text(f"PRAGMA table_xinfo({table})"))}
+
+
+async def _add_columns(conn: AsyncConnection, table: str, columns: List[tuple]):
+    existing = await _columns(conn, table)
+    for name, ddl in columns:
+        if name not in existing:
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+async def _baseline(conn: AsyncConnection):
+    await conn.run_sync(Base.metadata.create_all)
+
+
+async def _cover_url(conn: AsyncConnection):
+    await _add_columns(conn, "books", [("cover_url", "VARCHAR")])
+
+
+async def _book_details(conn: AsyncConnection):
+    await _add_columns(conn, "books", [
+        ("copies", "INTEGER NOT NULL DEFAULT 1"),
+        ("purchase_price", "NUMERIC(10, 2)"),
+        ("date_purchased", "DATE"),
+        ("date_read", "DATE"),
+        ("comment", "VARCHAR"),
+        ("daw_book_number", "INTEGER"),
+        ("daw_catalog_number", "VARCHAR(6)"),
+        ("publication_date", "DATE"),
+        ("publisher", "VARCHAR(255)"),
+        ("pages", "INTEGER"),
+        ("dimensions", "VARCHAR(50)"),
+        ("book_format", "VARCHAR(100)"),
+    ])
+
+
+async def _search_index(conn: AsyncConnection):
+    # The triggers index new and changed rows from here on; the backfill adds
+    # the existing ones
+    for ddl in FTS_DDL:
+        await conn.execute(text(ddl))
+
+
+async def _sort_indexes(conn: AsyncConnection):
+    # VIRTUAL generated columns can be added in place, with no backfill
+    await _add_columns(conn, "books", [
+        ("book_format_norm", "VARCHAR(100) GENERATED ALWAYS AS (lower(trim(book_format))) VIRTUAL")])
+
+    def create_missing(sync_conn):
+        existing = {row[1] for row in sync_conn.exec_driver_sql("PRAGMA index_list(books)")}
+        for index in Book.__table__.indexes:
+            if index.name not in existing:
+                index.create(sync_conn)
+
+    await conn.run_sync(create_missing)
+    await refresh_statistics(conn)
+
+
+async def _dedupe_tables(conn: AsyncConnection):
+    # Keys are filled in lazily by services.dedupe.refresh_keys, not here
+    for ddl in DEDUPE_DDL:
+        await conn.execute(text(ddl))
+
+
+async def _stats_summary(conn: AsyncConnection):
+    # One GROUP BY pass per dimension, in the same transaction that creates
+    # the triggers, so no book is counted twice or missed
+    for ddl in STATS_DDL:
+        await conn.execute(text(ddl))
+    await rebuild_stats(conn)
+
+
+async def _job_queue(conn: AsyncConnection):
+    await conn.run_sync(lambda sync_conn: Job.__table__.create(sync_conn, checkfirst=True))
+
+
+MIGRATIONS = [
+    Migration(1, "baseline tables", _baseline),
+    Migration(2, "books.cover_url", _cover_url),
+    Migration(3, "book detail and reading columns", _book_details),
+    Migration(4, "full-text search index", _search_index, Backfill(f"""
+        INSERT INTO books_fts(rowid, {", ".join(FTS_COLUMNS)})
+        SELECT id, {", ".join(FTS_COLUMNS)} FROM books
+        WHERE id BETWEEN :first_id AND :last_id
+          AND id NOT IN (SELECT id FROM books_fts_docsize WHERE id BETWEEN :first_id AND :last_id)
+    """)),
+    Migration(5, "sort and filter indexes, books.book_format_norm", _sort_indexes),
+    Migration(6, "duplicate detection keys", _dedupe_tables),
+    Migration(7, "collection statistics summary", _stats_summary),
+    Migration(8, "background job queue", _job_queue),
+]
+LATEST = MIGRATIONS[-1].version
+
+VERSION_DDL = """CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)"""
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    try:
+        return (await conn.execute(text("SELECT max(version) FROM schema_version"))).scalar() or 0
+    except OperationalError:  # no such table: a database from before this runner
+        await conn.rollback()
+        return 0
+
+
+async def _run_backfill(engine: AsyncEngine, migration: Migration, progress=None):
+    name = f"migration:{migration.version}"
+    backfill = migration.backfill
+    while True:
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            last_id = (await conn.execute(text(
+                "SELECT last_id FROM job_checkpoints WHERE name = :name"), {"name": name})).scalar() or 0
+            max_id = (await conn.execute(text("SELECT max(id) FROM books"))).scalar() or 0
+            if last_id >= max_id:
+                await conn.rollback()
+                return
+            upto = min(last_id + backfill.batch_size, max_id)
+            await conn.execute(text(backfill.sql), {"first_id": last_id + 1, "last_id": upto})
+            await conn.execute(text("""
+                INSERT INTO job_checkpoints (name, last_id) VALUES (:name, :last_id)
+                ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id, updated_at = CURRENT_TIMESTAMP
+            """), {"name": name, "last_id": upto})
+            await conn.commit()
+        if progress:
+            progress(migration, upto, max_id)
+
+
+async def migrate(engine: AsyncEngine, progress=None) -> List[Migration]:
+    """Apply every migration newer than the database's version.  Returns those applied."""
+    async with engine.connect() as conn:
+        if await current_version(conn) >= LATEST:
+            return []
+
+    applied = []
+    for migration in MIGRATIONS:
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            await conn.execute(text(VERSION_DDL))
+            if await current_version(conn) >= migration.version:
+                await conn.rollback()  # another process got here first
+                continue
+            await migration.apply(conn)
+            if migration.backfill is None:
+                await _record(conn, migration)
+            await conn.commit()
+
+        if migration.backfill is not None:
+            await _run_backfill(engine, migration, progress)
+            async with engine.connect() as conn:
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+                if await current_version(conn) < migration.version:
+                    await _record(conn, migration)
+                await conn.commit()
+        print(f"Applied migration {migration.version}: {migration.description}")
+        applied.append(migration)
+    return applied
+
+
+async def _record(conn: AsyncConnection, migration: Migration):
+    await conn.execute(text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+                       {"version": migration.version, "description": migration.description})
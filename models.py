@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Numeric, Date
+from sqlalchemy import Column, Integer, String, Float, Numeric, Date, DateTime, Computed, Index, collate, func, text
 from database import Base   # ← absolute, correct
 
 class Book(Base):
@@ -24,4 +24,56 @@ class Book(Base):
     pages = Column(Integer, nullable=True)
     dimensions = Column(String(50), nullable=True)
     book_format = Column(String(100), nullable=True)
+    # lower-cased, trimmed book_format for case-insensitive filtering and sorting
+    book_format_norm = Column(String(100), Computed("lower(trim(book_format))", persisted=False))
 
+
+# Access paths for the home() sorts and filters (crud/book.py).  Nullable sort
+# columns order NULLs last as (col IS NULL, col, id), so each gets one index per
+# direction; the same indexes serve the prefix and date-range filters.
+_publisher_nocase = collate(Book.publisher, "NOCASE")
+Index("ix_books_date_read_asc", Book.date_read.is_(None), Book.date_read, Book.id)
+Index("ix_books_date_read_desc", Book.date_read.is_(None), Book.date_read.desc(), Book.id.desc())
+Index("ix_books_date_purchased_asc", Book.date_purchased.is_(None), Book.date_purchased, Book.id)
+Index("ix_books_date_purchased_desc", Book.date_purchased.is_(None), Book.date_purchased.desc(), Book.id.desc())
+Index("ix_books_publisher_asc", Book.publisher.is_(None), _publisher_nocase, Book.id)
+Index("ix_books_publisher_desc", Book.publisher.is_(None), _publisher_nocase.desc(), Book.id.desc())
+Index("ix_books_format_asc", Book.book_format_norm.is_(None), Book.book_format_norm, Book.id)
+Index("ix_books_format_desc", Book.book_format_norm.is_(None), Book.book_format_norm.desc(), Book.id.desc())
+
+
+class JobCheckpoint(Base):
+    """Last processed book id for resumable background jobs (e.g. enrichment)."""
+    __tablename__ = "job_checkpoints"
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+
+class Job(Base):
+    """
+    A unit of background work (services/jobs.py), e.g. looking up metadata
+    for a newly added book.  ``key`` identifies what the job is about (the
+    ISBN-13 for lookups); only one queued or running job may exist per
+    (kind, key), so adding the same book twice doesn't look it up twice.
+    """
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    book_id = Column(Integer, nullable=True, index=True)
+    status = Column(String, nullable=False, default="queued")    # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(Float, nullable=False)                   # epoch seconds; later for retries
+    locked_until = Column(Float, nullable=True)                 # lease of the worker running it
+    last_error = Column(String, nullable=True)
+    result = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+    updated_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+
+PENDING = text("status IN ('queued', 'running')")
+Index("ux_jobs_pending_key", Job.kind, Job.key, unique=True, sqlite_where=PENDING)
+Index("ix_jobs_queue", Job.run_after, Job.id, sqlite_where=text("status = 'queued'"))
+Index("ix_jobs_leases", Job.locked_until, sqlite_where=text("status = 'running'"))
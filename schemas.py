@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from datetime import date
+from decimal import Decimal
+from pydantic import BaseModel, Field
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
 
 class BookBase(BaseModel):
     title: str
@@ -9,13 +11,79 @@ class BookBase(BaseModel):
     lccn: Optional[str] = None
     description: Optional[str] = None
     cover_url: Optional[str] = None
+    purchase_price: Optional[Decimal] = None
+    date_purchased: Optional[date] = None
+    date_read: Optional[date] = None
+    comment: Optional[str] = None
+    daw_book_number: Optional[int] = None
+    daw_catalog_number: Optional[str] = Field(None, max_length=6)
+    publication_date: Optional[date] = None
+    publisher: Optional[str] = Field(None, max_length=255)
+    pages: Optional[int] = None
+    dimensions: Optional[str] = Field(None, max_length=50)
+    book_format: Optional[str] = Field(None, max_length=100)
 
 class BookCreate(BookBase):
     pass
 
+class BookUpdate(BookBase):
+    """Only the fields given are changed.  Typed str with a None default, so title and author can't be set to null."""
+    title: str = Field(None, min_length=1)
+    author: str = Field(None, min_length=1)
+    copies: int = Field(None, ge=1)
+
 class Book(BookBase):
     id: int
+    copies: int = 1
+    book_format_norm: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+
+class IsbnBatch(BaseModel):
+    isbns: List[str]
+
+
+# /api/v1 responses.  Items hold only the requested fields (all stored
+# columns by default), so they are documented as plain objects; prices are
+# strings, as in /export.jsonl, and dates ISO 8601.
+class BookPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+class BookBatch(BaseModel):
+    items: List[Dict[str, Any]]
+    missing: List[str]
+
+
+# POST /api/v1/books/batch (crud/batch.py).  Each operation is one of:
+#   {"op": "add", "book": {...BookCreate}}
+#   {"op": "update", "id": 12, "set": {...BookUpdate}}
+#   {"op": "delete", "id": 12}
+class AddOperation(BaseModel):
+    op: Literal["add"]
+    book: BookCreate
+
+class UpdateOperation(BaseModel):
+    op: Literal["update"]
+    id: int
+    set: BookUpdate
+
+class DeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+BatchOperation = Annotated[Union[AddOperation, UpdateOperation, DeleteOperation], Field(discriminator="op")]
+
+class BatchWrite(BaseModel):
+    # Plain objects here; each is validated as a BatchOperation on its own so
+    # one bad item gets an "invalid" result instead of failing the whole call
+    operations: List[Dict[str, Any]]
+    atomic: bool = False
+
+class BatchWriteResult(BaseModel):
+    applied: bool
+    summary: Dict[str, int]
+    results: List[Dict[str, Any]]
@@ -0,0 +1,48 @@
+# serve.py — production launcher: several uvicorn worker processes, no reload
+#
+#   python serve.py [--workers N] [--host 127.0.0.1] [--port 8000]
+#
+# startMyBooks.sh runs one reloading process for development; this runs
+# --workers processes (default: one per core) so page rendering and ISBN
+# math use every core.  Migrations run here once, before any worker starts,
+# so each worker's startup only finds the schema current.  With more than
+# one worker the page cache uses its SQLite backend (services/page_cache.py)
+# so a write handled by one worker invalidates pages cached by the others;
+# the provider lookup cache is already a SQLite file they all share.
+import argparse
+import asyncio
+import os
+
+import uvicorn
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run BookTracker with several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        os.environ.setdefault("BOOKTRACKER_CACHE_BACKEND", "sqlite")
+    # Imported after the backend is chosen; workers are fresh processes and read it from the environment
+    from database import init_db, engine
+    from services.page_cache import SharedState
+
+    async def prepare():
+        await init_db()
+        await engine.dispose()   # don't carry open connections into the workers
+
+    asyncio.run(prepare())
+    if os.environ.get("BOOKTRACKER_CACHE_BACKEND") == "sqlite":
+        SharedState().reset()   # the database may have changed since the last run
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} worker(s)", flush=True)
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers,
+                app_dir=ROOT, log_level=args.log_level, proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# services/covers.py — local on-disk cache of cover images and their thumbnails
+import asyncio
+import hashlib
+import os
+from typing import Dict, Optional
+
+from database import DATABASE_PATH
+from services.http_client import get_client
+
+try:
+    from PIL import Image  # optional: without Pillow the original image is served for every size
+except ImportError:
+    Image = None
+
+COVER_DIR = os.environ.get(
+    "BOOKTRACKER_COVER_DIR",
+    os.path.join(os.path.dirname(DATABASE_PATH) or ".", "covers"),
+)
+MAX_CACHE_BYTES = int(os.environ.get("BOOKTRACKER_COVER_CACHE_MB", 500)) * 1024 * 1024
+NO_COVER = os.path.join("static", "no-cover.jpg")
+# size name -> bounding box; thumb is 2x the 80px the home table displays
+SIZES = {"thumb": (160, 240), "medium": (320, 480)}
+# Upstream content type -> file extension originals are stored under; thumbnails are always JPEG
+EXTENSIONS = {"image/jpeg": ".jpg", "image/jpg": ".jpg", "image/pjpeg": ".jpg",
+              "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+MEDIA_TYPES = {".jpg": "image/jpeg", ".png": "image/png", ".gif": "image/gif", ".webp": "image/webp"}
+
+_locks: Dict[str, asyncio.Lock] = {}
+_cache_bytes: Optional[int] = None
+
+
+def cover_key(cover_url: Optional[str]) -> str:
+    """Stable short key for a cover URL; changes whenever the book's cover_url changes."""
+    return hashlib.sha1(cover_url.encode()).hexdigest()[:16] if cover_url else "none"
+
+
+def _path(key: str, size: str, extension: str = ".jpg") -> str:
+    return os.path.join(COVER_DIR, size, f"{key}{extension}")
+
+
+def media_type(path: str) -> str:
+    """Content type to serve a cached file with, from the extension it was stored under."""
+    return MEDIA_TYPES.get(os.path.splitext(path)[1], "image/jpeg")
+
+
+def _stored_bytes() -> int:
+    global _cache_bytes
+    if _cache_bytes is None:
+        _cache_bytes = sum(entry.stat().st_size
+                           for size_dir in os.scandir(COVER_DIR) if size_dir.is_dir()
+                           for entry in os.scandir(size_dir.path))
+    return _cache_bytes
+
+
+def _evict(keep: str):
+    """Delete least recently served files (never ``keep``) until the cache fits under MAX_CACHE_BYTES."""
+    global _cache_bytes
+    if _stored_bytes() <= MAX_CACHE_BYTES:
+        return
+    files = sorted(
+        (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+        for size_dir in os.scandir(COVER_DIR) if size_dir.is_dir()
+        for entry in os.scandir(size_dir.path))
+    for _, size, path in files:
+        if _cache_bytes <= MAX_CACHE_BYTES * 0.9:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            _cache_bytes -= size
+        except FileNotFoundError:
+            pass
+
+
+def _added(path: str):
+    global _cache_bytes
+    _cache_bytes += os.path.getsize(path)
+    _evict(keep=path)
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _stored_bytes()
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(data)
+    os.replace(f"{path}.tmp", path)
+    _added(path)
+
+
+def _make_thumbnail(original: str, path: str, box):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _stored_bytes()
+    with Image.open(original) as image:
+        image = image.convert("RGB")
+        image.thumbnail(box)
+        image.save(f"{path}.tmp", "JPEG", quality=85, optimize=True)
+    os.replace(f"{path}.tmp", path)
+    _added(path)
+
+
+def _touch(path: str) -> bool:
+    """Mark a cached file as recently used; False if it has been evicted."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _find_original(key: str) -> Optional[str]:
+    for extension in MEDIA_TYPES:
+        path = _path(key, "original", extension)
+        if _touch(path):
+            return path
+    return None
+
+
+async def get_cover(cover_url: Optional[str], size: str = "original") -> Optional[str]:
+    """
+    Path of the cached image for ``cover_url`` at ``size``, fetching and
+    resizing on first use.  None if there is no cover or it can't be fetched.
+    """
+    if not cover_url:
+        return None
+    if size not in SIZES or Image is None:
+        size = "original"
+    key = cover_key(cover_url)
+    if size == "original":
+        wanted = _find_original(key)
+        if wanted is not None:
+            return wanted
+    else:
+        wanted = _path(key, size)
+        if _touch(wanted):
+            return wanted
+
+    if len(_locks) > 1000:
+        # Only idle locks: a request holding one must keep excluding the others for its key
+        for idle in [k for k, held in _locks.items() if not held.locked()]:
+            del _locks[idle]
+    lock = _locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        try:
+            original = _find_original(key)
+            if original is None:
+                r = await get_client().get(cover_url, timeout=10.0)
+                extension = EXTENSIONS.get(r.headers.get("content-type", "").split(";")[0].strip().lower())
+                if r.status_code != 200 or extension is None:
+                    return None
+                original = _path(key, "original", extension)
+                await asyncio.to_thread(_write, original, r.content)
+            if size == "original":
+                return original
+            if not _touch(wanted):
+                await asyncio.to_thread(_make_thumbnail, original, wanted, SIZES[size])
+            return wanted
+        except Exception as e:
+            print(f"Cover fetch error for {cover_url}: {e}")
+            return None
@@ -0,0 +1,301 @@
+# services/dedupe.py — find books entered more than once, with or without ISBNs
+#
+# Comparing every pair of books is N² work, so candidates are found by
+# blocking instead:
+#
+#   1. Title and author are normalized (case, accents, punctuation, leading
+#      articles, "Last, First" author order) and stored in dedupe_books.
+#   2. The title's character trigrams get a MinHash signature, cut into
+#      bands; each band becomes a key in dedupe_keys.  Two titles whose
+#      trigram sets overlap well are likely to share at least one key.
+#   3. Only books sharing a key are scored, on the trigram similarity of
+#      title and author.
+#
+# Keys are computed incrementally: books missing from dedupe_books are
+# indexed by a "dedupe" background job (services/jobs.py) that writes queue
+# after adding or editing books, and triggers drop a book's keys when its
+# title or author changes or it is deleted.  Finding duplicates only reads.  With NumPy the keys of a whole
+# chunk of books are computed in one pass; without it a plain loop gives the
+# same keys.
+import asyncio
+import re
+import unicodedata
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services import jobs
+
+try:
+    import numpy as np  # optional: without NumPy the pure-Python path is used
+except ImportError:
+    np = None
+
+BANDS, ROWS = 6, 3              # 18 hash functions; pairs above ~0.55 trigram Jaccard usually collide
+THRESHOLD = 0.87                # minimum combined score to report a pair
+MAX_BLOCK = 200                 # keys shared by more books than this are too common to be useful
+CHUNK = 5000                    # books read and indexed per batch
+
+_PRIME = (1 << 31) - 1
+_SEEDS = [(1 + 2 * zlib.crc32(f"a{i}".encode()) % (_PRIME - 1), zlib.crc32(f"b{i}".encode()) % _PRIME)
+          for i in range(BANDS * ROWS)]
+_ARTICLES = {"the", "a", "an"}
+_NOT_WORD = re.compile(r"[^\w\s]+")
+_SERIES = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+
+DDL = [
+    """CREATE TABLE IF NOT EXISTS dedupe_books (
+        book_id INTEGER PRIMARY KEY,
+        title_norm VARCHAR NOT NULL,
+        author_norm VARCHAR NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS dedupe_keys (
+        key INTEGER NOT NULL,
+        book_id INTEGER NOT NULL,
+        PRIMARY KEY (key, book_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS ix_dedupe_keys_book_id ON dedupe_keys (book_id)",
+    """CREATE TABLE IF NOT EXISTS dedupe_dismissed (
+        book_a INTEGER NOT NULL,
+        book_b INTEGER NOT NULL,
+        PRIMARY KEY (book_a, book_b)
+    ) WITHOUT ROWID""",
+    """CREATE TRIGGER IF NOT EXISTS books_dedupe_au AFTER UPDATE OF title, author ON books BEGIN
+        DELETE FROM dedupe_keys WHERE book_id = old.id;
+        DELETE FROM dedupe_books WHERE book_id = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS books_dedupe_ad AFTER DELETE ON books BEGIN
+        DELETE FROM dedupe_keys WHERE book_id = old.id;
+        DELETE FROM dedupe_books WHERE book_id = old.id;
+        DELETE FROM dedupe_dismissed WHERE book_a = old.id OR book_b = old.id;
+    END""",
+]
+
+
+def _fold(value: str) -> str:
+    value = value or ""
+    if not value.isascii():
+        value = unicodedata.normalize("NFKD", value)
+        value = "".join(c for c in value if not unicodedata.combining(c))
+    value = value.lower().replace("&", " and ")
+    return " ".join(_NOT_WORD.sub(" ", value).split())
+
+
+def normalize_title(title: str) -> str:
+    """Lower-case, unaccented words; series notes in brackets and a leading article dropped."""
+    words = _fold(_SERIES.sub(" ", title or "")).split()
+    if len(words) > 1 and words[0] in _ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def normalize_author(author: str) -> str:
+    """Sorted name tokens, so "Le Guin, Ursula K." and "Ursula K. Le Guin" match."""
+    names = []
+    for name in re.split(r";|&| and ", author or ""):
+        if "," in name:
+            last, _, first = name.partition(",")
+            name = f"{first} {last}"
+        names.append(" ".join(sorted(_fold(name).split())))
+    names = sorted(filter(None, names))
+    return "" if names == ["unknown"] else " / ".join(names)
+
+
+_MASK64 = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15        # odd 64-bit multiplier for combining a band's rows into one key
+
+
+def _trigrams(title_norm: str) -> List[int]:
+    # Code points are below 2^21, so three of them pack exactly into one integer
+    padded = f" {title_norm} "
+    return [((ord(padded[i]) << 42) | (ord(padded[i + 1]) << 21) | ord(padded[i + 2])) % _PRIME
+            for i in range(len(padded) - 2)]
+
+
+def _signed(key: int) -> int:
+    return key - (1 << 64) if key >= 1 << 63 else key   # SQLite integers are signed 64-bit
+
+
+def _keys_python(titles_norm: List[str]) -> List[List[int]]:
+    keys = []
+    for title in titles_norm:
+        grams = _trigrams(title)
+        signature = [min((a * h + b) % _PRIME for h in grams) for a, b in _SEEDS]
+        book_keys = []
+        for band in range(BANDS):
+            key = band
+            for value in signature[band * ROWS:(band + 1) * ROWS]:
+                key = ((key ^ value) * _MIX) & _MASK64
+            book_keys.append(_signed(key))
+        keys.append(book_keys)
+    return keys
+
+
+def _keys_numpy(titles_norm: List[str]) -> List[List[int]]:
+    padded = [f" {title} " for title in titles_norm]
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=len(padded))
+    points = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    owner = np.repeat(np.arange(len(padded)), lengths)
+    # Trigrams starting at every position, minus those running into the next title
+    grams = ((points[:-2] << 42) | (points[1:-1] << 21) | points[2:]) % _PRIME
+    inside = owner[:-2] == owner[2:]
+    grams, owner = grams[inside], owner[:-2][inside]
+    a = np.array([seed[0] for seed in _SEEDS], dtype=np.int64)
+    b = np.array([seed[1] for seed in _SEEDS], dtype=np.int64)
+    # grams < 2^31 and a < 2^31, so a*h + b fits in int64
+    permuted = (grams[:, None] * a + b) % _PRIME
+    starts = np.concatenate(([0], np.cumsum(lengths - 2)[:-1]))
+    signatures = np.minimum.reduceat(permuted, starts, axis=0).astype(np.uint64)
+    keys = np.zeros((len(padded), BANDS), dtype=np.uint64)
+    with np.errstate(over="ignore"):  # the multiply is meant to wrap around at 2^64
+        for band in range(BANDS):
+            key = np.full(len(padded), band, dtype=np.uint64)
+            for row in range(ROWS):
+                key = (key ^ signatures[:, band * ROWS + row]) * np.uint64(_MIX)
+            keys[:, band] = key
+    return keys.view(np.int64).tolist()
+
+
+def minhash_keys(titles_norm: List[str]) -> List[List[int]]:
+    """The band keys for each normalized, non-empty title."""
+    if np is None or not titles_norm:
+        return _keys_python(titles_norm)
+    return _keys_numpy(titles_norm)
+
+
+def _index_rows(rows: List[tuple]) -> Tuple[List[tuple], List[tuple]]:
+    books = [(r[0], normalize_title(r[1]), normalize_author(r[2])) for r in rows]
+    titled = [b for b in books if b[1]]  # nothing to compare an empty title with
+    keys = minhash_keys([b[1] for b in titled])
+    return books, [(key, b[0]) for b, book_keys in zip(titled, keys) for key in book_keys]
+
+
+async def refresh_keys(db: AsyncSession) -> int:
+    """Index books added or retitled since the last refresh.  Returns how many were indexed."""
+    indexed = 0
+    while True:
+        conn = await db.connection()  # commit() releases it, so ask again each batch
+        rows = (await conn.exec_driver_sql("""
+            SELECT id, title, author FROM books
+            WHERE id NOT IN (SELECT book_id FROM dedupe_books)
+            ORDER BY id LIMIT ?
+        """, (CHUNK,))).all()
+        if not rows:
+            return indexed
+        books, keys = await asyncio.to_thread(_index_rows, [tuple(r) for r in rows])
+        # Plain tuples through the driver: several times faster than bound dicts for this many rows
+        await conn.exec_driver_sql("INSERT OR REPLACE INTO dedupe_books VALUES (?, ?, ?)", books)
+        if keys:
+            await conn.exec_driver_sql("INSERT OR IGNORE INTO dedupe_keys VALUES (?, ?)", keys)
+        await db.commit()
+        indexed += len(rows)
+
+
+async def schedule_refresh(db: AsyncSession) -> bool:
+    """Queue a refresh_keys run, unless one is already queued.  Commits."""
+    return await jobs.enqueue(db, "dedupe", "refresh")
+
+
+async def unindexed(db: AsyncSession) -> int:
+    """Books a refresh hasn't indexed yet."""
+    return (await db.execute(text(
+        "SELECT count(*) FROM books WHERE id NOT IN (SELECT book_id FROM dedupe_books)"))).scalar_one()
+
+
+def trigram_set(value: str) -> set:
+    padded = f" {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: set, b: set) -> float:
+    if a is b:
+        return 1.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+def similarity(a: Tuple[set, set], b: Tuple[set, set]) -> float:
+    """
+    Score two (title, author) trigram-set pairs between 0 and 1: the Dice
+    coefficient of each, with the title counting most.
+    """
+    title = _dice(a[0], b[0])
+    if len(a[1]) <= 1 or len(b[1]) <= 1:
+        # One side has no author (or "Unknown"): the title is all there is to go on
+        return title
+    return 0.6 * title + 0.4 * _dice(a[1], b[1])
+
+
+@dataclass
+class DuplicateGroup:
+    book_ids: List[int]
+    score: float                          # the weakest link that joined the group
+    pairs: List[Tuple[int, int, float]] = field(default_factory=list)
+
+
+async def find_duplicates(db: AsyncSession, threshold: float = THRESHOLD) -> List[DuplicateGroup]:
+    """
+    Groups of books that look like the same work, best matches first.
+
+    Candidate pairs share a MinHash key; pairs the user dismissed are left
+    out.  Pairs above ``threshold`` are joined transitively into groups.
+    Books not indexed yet (see unindexed()) aren't considered.
+    """
+    conn = await db.connection()
+    candidates = (await conn.exec_driver_sql("""
+        WITH blocks AS (
+            SELECT key FROM dedupe_keys GROUP BY key HAVING count(*) BETWEEN 2 AND ?
+        )
+        SELECT DISTINCT a.book_id, b.book_id
+        FROM blocks
+        JOIN dedupe_keys a ON a.key = blocks.key
+        JOIN dedupe_keys b ON b.key = blocks.key AND b.book_id > a.book_id
+        WHERE NOT EXISTS (SELECT 1 FROM dedupe_dismissed d WHERE d.book_a = a.book_id AND d.book_b = b.book_id)
+    """, (MAX_BLOCK,))).all()
+    normalized = {row[0]: (row[1], row[2]) for row in
+                  await conn.exec_driver_sql("SELECT book_id, title_norm, author_norm FROM dedupe_books")}
+
+    def score(pairs):
+        # Shared by every book with the same normalized string, which also makes _dice's `is` check hit
+        by_string: Dict[str, set] = {}
+        trigrams: Dict[int, tuple] = {}
+
+        def grams(book_id):
+            if book_id not in trigrams:
+                trigrams[book_id] = tuple(by_string.get(v) or by_string.setdefault(v, trigram_set(v))
+                                          for v in normalized[book_id])
+            return trigrams[book_id]
+
+        return [(a, b, s) for a, b in pairs if (s := similarity(grams(a), grams(b))) >= threshold]
+
+    pairs = await asyncio.to_thread(score, candidates)
+
+    parent: Dict[int, int] = {}
+
+    def root(book_id: int) -> int:
+        parent.setdefault(book_id, book_id)
+        while parent[book_id] != book_id:
+            parent[book_id] = parent[parent[book_id]]
+            book_id = parent[book_id]
+        return book_id
+
+    for a, b, _ in pairs:
+        parent[root(a)] = root(b)
+    groups: Dict[int, DuplicateGroup] = {}
+    for a, b, s in pairs:
+        group = groups.setdefault(root(a), DuplicateGroup([], 1.0))
+        group.pairs.append((a, b, s))
+        group.score = min(group.score, s)
+    for group in groups.values():
+        group.book_ids = sorted({i for a, b, _ in group.pairs for i in (a, b)})
+    return sorted(groups.values(), key=lambda g: (-g.score, g.book_ids[0]))
+
+
+async def dismiss(db: AsyncSession, book_ids: List[int]):
+    """Record that these books are not duplicates of each other."""
+    ids = sorted(set(book_ids))
+    await db.execute(text("INSERT OR IGNORE INTO dedupe_dismissed VALUES (:a, :b)"),
+                     [{"a": a, "b": b} for i, a in enumerate(ids) for b in ids[i + 1:]])
+    await db.commit()
@@ -0,0 +1,234 @@
+# services/enrichment.py — background job that fills in missing book metadata from the providers
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, or_, bindparam, func, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import AsyncSessionLocal
+from models import Book, JobCheckpoint
+from services.page_cache import page_cache
+from services.google_books import openlibrary_lookup, google_lookup, isbndb_lookup, merge_results, ProviderUnavailable
+
+CHECKPOINT_NAME = "enrichment"
+ENRICH_FIELDS = ["cover_url", "description", "publisher", "pages"]
+# What /add saves when it only has an ISBN; a lookup may replace these
+PLACEHOLDERS = {"title": "Untitled", "author": "Unknown"}
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BATCH_SIZE = 100
+# Requests per second we allow ourselves against each provider
+PROVIDER_RATES = {"openlibrary": 5.0, "google": 5.0, "isbndb": 1.0}
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart; waiting callers queue up in order."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class EnrichmentJob:
+    """
+    Walks incomplete books in id order, looks each one up on all three
+    providers and fills in only the columns that are still NULL.
+
+    Progress is checkpointed after every batch, in the same transaction as
+    the batch's UPDATE, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.limiters = {name: RateLimiter(rate) for name, rate in PROVIDER_RATES.items()}
+        self.running = False
+        self.processed = 0
+        self.updated = 0
+        self.last_id = 0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def status(self) -> Dict:
+        elapsed = (self.finished or time.monotonic()) - self.started if self.started else 0.0
+        return {
+            "running": self.running,
+            "processed": self.processed,
+            "updated": self.updated,
+            "last_id": self.last_id,
+            "seconds": round(elapsed, 1),
+            "books_per_second": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            "error": self.error,
+        }
+
+    async def _lookup(self, isbn: str, raise_errors: bool = False) -> Dict:
+        """
+        The merged result of all three providers.  With ``raise_errors``, a
+        provider that couldn't be asked raises ProviderUnavailable, but only
+        after the others have answered; their results are in its ``partial``.
+        """
+        async def call(name, lookup):
+            await self.limiters[name].wait()
+            return await lookup(isbn=isbn, raise_errors=raise_errors)
+
+        results = await asyncio.gather(
+            call("openlibrary", openlibrary_lookup),
+            call("google", google_lookup),
+            call("isbndb", isbndb_lookup),
+            return_exceptions=raise_errors,
+        )
+        merged = merge_results(*(None if isinstance(r, Exception) else r for r in results))
+        failure = next((r for r in results if isinstance(r, Exception)), None)
+        if failure is not None:
+            failure.partial = merged
+            raise failure
+        return merged
+
+    async def _enrich(self, semaphore: asyncio.Semaphore, book) -> Optional[Dict]:
+        async with semaphore:
+            merged = await self._lookup(book.isbn13 or book.isbn10)
+        values = {}
+        for field in ENRICH_FIELDS:
+            if getattr(book, field) is None and merged.get(field):
+                values[field] = merged[field]
+        if "pages" in values:
+            try:
+                values["pages"] = int(values["pages"])
+            except (TypeError, ValueError):
+                del values["pages"]
+        if not values:
+            return None
+        return {"b_id": book.id, **{f"b_{field}": values.get(field) for field in ENRICH_FIELDS}}
+
+    async def _next_batch(self, db) -> List:
+        incomplete = or_(*(getattr(Book, field).is_(None) for field in ENRICH_FIELDS))
+        has_isbn = or_(Book.isbn13.isnot(None), Book.isbn10.isnot(None))
+        result = await db.execute(
+            select(Book.id, Book.isbn13, Book.isbn10, *(getattr(Book, f) for f in ENRICH_FIELDS))
+            .where(Book.id > self.last_id, incomplete, has_isbn)
+            .order_by(Book.id)
+            .limit(self.batch_size))
+        return result.all()
+
+    async def _write(self, db, updates: List[Dict]):
+        table = Book.__table__
+        if updates:
+            # COALESCE keeps anything a user filled in while the lookup was in flight
+            await db.execute(
+                table.update().where(table.c.id == bindparam("b_id")).values(
+                    **{field: func.coalesce(table.c[field], bindparam(f"b_{field}")) for field in ENRICH_FIELDS}),
+                updates)
+        checkpoint = sqlite_insert(JobCheckpoint).values(name=CHECKPOINT_NAME, last_id=self.last_id)
+        await db.execute(checkpoint.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"last_id": checkpoint.excluded.last_id, "updated_at": func.current_timestamp()}))
+        await db.commit()
+        if updates:
+            await page_cache.invalidate(*(u["b_id"] for u in updates))
+
+    async def run(self, restart: bool = False, progress=None):
+        self.running = True
+        self.error = None
+        self.started = time.monotonic()
+        self.finished = None
+        self.processed = self.updated = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with AsyncSessionLocal() as db:
+                if restart:
+                    self.last_id = 0
+                else:
+                    self.last_id = (await db.scalar(
+                        select(JobCheckpoint.last_id).where(JobCheckpoint.name == CHECKPOINT_NAME))) or 0
+            while True:
+                async with AsyncSessionLocal() as db:
+                    books = await self._next_batch(db)
+                if not books:
+                    break
+                results = await asyncio.gather(*(self._enrich(semaphore, b) for b in books))
+                updates = [r for r in results if r]
+                self.last_id = books[-1].id
+                async with AsyncSessionLocal() as db:
+                    await self._write(db, updates)
+                self.processed += len(books)
+                self.updated += len(updates)
+                if progress:
+                    progress(self)
+        except Exception as e:
+            self.error = str(e)
+            raise
+        finally:
+            self.running = False
+            self.finished = time.monotonic()
+
+
+job = EnrichmentJob()
+
+
+async def enrich_book(book_id: int) -> Dict:
+    """
+    Look one book up on every provider and fill in what it is missing,
+    including the /add placeholders.  Returns the columns changed.
+
+    If a provider couldn't be asked and something is still missing,
+    ProviderUnavailable is raised after saving what the others found, so
+    a queued job is retried later.
+    """
+    async with AsyncSessionLocal() as db:
+        book = await db.get(Book, book_id)
+    if book is None or not (book.isbn13 or book.isbn10):
+        return {}
+    failure = None
+    try:
+        merged = await job._lookup(book.isbn13 or book.isbn10, raise_errors=True)
+    except ProviderUnavailable as e:
+        failure, merged = e, e.partial
+
+    values = {field: merged[field] for field in ENRICH_FIELDS if getattr(book, field) is None and merged.get(field)}
+    if "pages" in values:
+        try:
+            values["pages"] = int(values["pages"])
+        except (TypeError, ValueError):
+            del values["pages"]
+    values.update({field: merged[field] for field, placeholder in PLACEHOLDERS.items()
+                   if getattr(book, field) == placeholder and merged.get(field)})
+    if values:
+        table = Book.__table__
+        # Like _write: never overwrite what a user entered while the lookup was in flight
+        guarded = {field: func.coalesce(table.c[field], value) for field, value in values.items()
+                   if field in ENRICH_FIELDS}
+        guarded.update({field: case((table.c[field] == PLACEHOLDERS[field], value), else_=table.c[field])
+                        for field, value in values.items() if field in PLACEHOLDERS})
+        async with AsyncSessionLocal() as db:
+            await db.execute(table.update().where(table.c.id == book_id).values(**guarded))
+            await db.commit()
+        await page_cache.invalidate(book_id)
+    missing = [f for f in ENRICH_FIELDS if getattr(book, f) is None and f not in values]
+    missing += [f for f, placeholder in PLACEHOLDERS.items() if getattr(book, f) == placeholder and f not in values]
+    if failure is not None and missing:
+        raise failure
+    return values
+
+
+_task: Optional[asyncio.Task] = None
+
+
+def start(restart: bool = False) -> bool:
+    """Run the shared job as a background task.  Returns False if it is already running."""
+    global _task
+    if _task is not None and not _task.done():
+        return False
+    job.running = True
+    _task = asyncio.create_task(job.run(restart=restart))
+    _task.add_done_callback(lambda t: t.cancelled() or t.exception())  # don't warn on failure; status has it
+    return True
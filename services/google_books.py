@@ -1,92 +1,222 @@
 # services/google_books.py — FINAL: triple fallback with redirects + ISBNdb
-import httpx
-from typing import Tuple, Optional, Dict
+import asyncio
+import functools
+import os
+import time
+from typing import Callable, Tuple, Optional, Dict
 
+from services import metrics
+from services.http_client import get_client, GOOGLE_BOOKS_URL, OPENLIBRARY_URL, ISBNDB_URL
+from services.lookup_cache import lookup_cache
+from services.openlibrary_local import openlibrary_index
+from services.resilience import CircuitBreaker, LatencyTracker, PendingCalls, hedged
+
+ISBNDB_API_KEY = os.environ.get("ISBNDB_API_KEY", "")
+# /lookup renders whatever answered within this many seconds; the rest load into the page later
+LOOKUP_DEADLINE = float(os.environ.get("BOOKTRACKER_LOOKUP_DEADLINE", 2.5))
+
+PROVIDERS: Dict[str, Callable] = {}           # name -> decorated lookup
+breakers: Dict[str, CircuitBreaker] = {}
+latencies: Dict[str, LatencyTracker] = {}
+pending_lookups = PendingCalls()
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of returning None, with raise_errors=True, when a provider couldn't be asked."""
+
+# Open Library author keys repeat across editions; remember their names so
+# most lookups need only the one edition request.
+_author_names: Dict[str, str] = {}
+MAX_AUTHOR_NAMES = 10_000
+
+def provider(name: str, timeout: float, enabled: Callable[[], bool] = lambda: True,
+             local: Optional[Callable[[str], Optional[Dict]]] = None):
+    """
+    Wrap a provider fetch with the persistent lookup cache, a circuit
+    breaker, an adaptive timeout, hedging and call metrics.
+
+    The wrapped coroutine returns a result dict, or None when the provider
+    has no such book (cached as a negative entry).  Exceptions, including
+    timeouts, mean the call itself failed; they are logged, not cached,
+    count against the breaker and are reported as None.  ``timeout`` is the
+    ceiling; once enough calls have been timed, 2x the observed p95 is used.
+    A call slower than the p95 is hedged with a second identical request.
+    ``local`` is an offline source asked before anything else; a miss there
+    falls through to the cache and the network.
+
+    Callers that retry later (the job queue) pass ``raise_errors=True`` to
+    tell a failed call from a book the provider doesn't have.
+    """
+    breaker = breakers[name] = CircuitBreaker()
+    latency = latencies[name] = LatencyTracker(ceiling=timeout)
+
+    def decorate(fetch):
+        @functools.wraps(fetch)
+        async def lookup(isbn: str = "", raise_errors: bool = False) -> Optional[Dict]:
+            isbn = isbn.strip()
+            if not isbn or not enabled():
+                return None
+            if local is not None:
+                result = await asyncio.to_thread(local, isbn)   # a SQLite read; keep it off the event loop
+                if result is not None:
+                    metrics.provider_calls.inc(provider=name, outcome="local")
+                    return result
+            hit, cached = await lookup_cache.get(name, isbn)
+            if hit:
+                metrics.provider_calls.inc(provider=name, outcome="hit" if cached else "negative_hit")
+                return cached
+            if not breaker.allow():
+                metrics.provider_calls.inc(provider=name, outcome="short_circuited")
+                if raise_errors:
+                    raise ProviderUnavailable(f"{name}: circuit open")
+                return None
+            hedge_after = latency.p95() if breaker.state == "closed" else None
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(hedged(lambda: fetch(isbn), hedge_after), latency.timeout())
+            except asyncio.CancelledError:
+                breaker.record_cancelled()
+                raise
+            except Exception as e:
+                metrics.provider_duration.observe(time.perf_counter() - started, provider=name)
+                metrics.provider_calls.inc(provider=name, outcome="error")
+                breaker.record_failure()
+                print(f"{name} lookup error: {e!r}")
+                if raise_errors:
+                    raise ProviderUnavailable(f"{name}: {e!r}") from e
+                return None
+            elapsed = time.perf_counter() - started
+            metrics.provider_duration.observe(elapsed, provider=name)
+            metrics.provider_calls.inc(provider=name, outcome="found" if result else "not_found")
+            latency.observe(elapsed)
+            breaker.record_success()
+            await lookup_cache.put(name, isbn, result)
+            return result
+        lookup.enabled = enabled
+        lookup.local = local
+        PROVIDERS[name] = lookup
+        return lookup
+    return decorate
+
+@provider("google", timeout=6.0)
 async def google_lookup(isbn: str = "") -> Optional[Dict]:
-    if not isbn:
+    r = await get_client().get(f"{GOOGLE_BOOKS_URL}/books/v1/volumes?q=isbn:{isbn}", timeout=6.0)
+    r.raise_for_status()
+    if not r.json().get("items"):
         return None
-    async with httpx.AsyncClient(timeout=6.0, follow_redirects=True) as client:
-        try:
-            r = await client.get(f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}")
-            if r.status_code == 200 and r.json().get("items"):
-                i = r.json()["items"][0]["volumeInfo"]
-                return {
-                    "title": i.get("title", ""),
-                    "author": ", ".join(i.get("authors", ["Unknown"])),
-                    "description": i.get("description", ""),
-                    "cover_url": i.get("imageLinks", {}).get("thumbnail", "").replace("http://", "https://"),
-                    "isbn13": next((x["identifier"] for x in i.get("industryIdentifiers", []) if x["type"] == "ISBN_13"), ""),
-                    "isbn10": next((x["identifier"] for x in i.get("industryIdentifiers", []) if x["type"] == "ISBN_10"), ""),
-                }
-        except:
-            pass
-    return None
+    i = r.json()["items"][0]["volumeInfo"]
+    return {
+        "title": i.get("title", ""),
+        "author": ", ".join(i.get("authors", ["Unknown"])),
+        "description": i.get("description", ""),
+        "cover_url": i.get("imageLinks", {}).get("thumbnail", "").replace("http://", "https://"),
+        "isbn13": next((x["identifier"] for x in i.get("industryIdentifiers", []) if x["type"] == "ISBN_13"), ""),
+        "isbn10": next((x["identifier"] for x in i.get("industryIdentifiers", []) if x["type"] == "ISBN_10"), ""),
+        "publisher": i.get("publisher", ""),
+        "pages": i.get("pageCount"),
+    }
+
+async def _openlibrary_author(key: str) -> str:
+    if key in _author_names:
+        return _author_names[key]
+    ar = await get_client().get(f"{OPENLIBRARY_URL}{key}.json", timeout=10.0)
+    if ar.status_code != 200:
+        return "Unknown"
+    if len(_author_names) >= MAX_AUTHOR_NAMES:
+        _author_names.clear()
+    name = _author_names[key] = ar.json().get("name", "Unknown")
+    return name
 
+@provider("openlibrary", timeout=10.0, local=openlibrary_index.get)
 async def openlibrary_lookup(isbn: str = "") -> Optional[Dict]:
-    if not isbn:
+    r = await get_client().get(f"{OPENLIBRARY_URL}/isbn/{isbn}.json", timeout=10.0)
+    if r.status_code == 404:
         return None
-    async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-        try:
-            r = await client.get(f"https://openlibrary.org/isbn/{isbn}.json")
-            if r.status_code != 200:
-                return None
-            data = r.json()
-            cover_id = data.get("covers", [None])[0]
-
-            author = "Unknown"
-            if data.get("by_statement"):
-                author = data["by_statement"]
-            elif data.get("authors"):
-                # Fetch first author's name if only key is provided
-                first_author = data["authors"][0]
-                if isinstance(first_author, dict) and "key" in first_author:
-                    ar = await client.get(f"https://openlibrary.org{first_author['key']}.json")
-                    if ar.status_code == 200:
-                        author_data = ar.json()
-                        author = author_data.get("name", "Unknown")
-                    else:
-                        author = "Unknown"
-                elif isinstance(first_author, dict) and "name" in first_author:
-                    author = first_author["name"]
-
-            description = ""
-            if data.get("description"):
-                if isinstance(data["description"], dict):
-                    description = data["description"].get("value", "")
-                else:
-                    description = str(data["description"])
-
-            return {
-                "title": data.get("title", ""),
-                "author": author,
-                "description": description,
-                "cover_url": f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg" if cover_id else None,
-                "isbn13": isbn if len(isbn) == 13 else None,
-                "isbn10": isbn if len(isbn) == 10 else None,
-            }
-        except Exception as e:
-            print(f"Open Library error: {e}")
-            return None
+    r.raise_for_status()
+    data = r.json()
+    cover_id = data.get("covers", [None])[0]
+
+    author = "Unknown"
+    if data.get("by_statement"):
+        author = data["by_statement"]
+    elif data.get("authors"):
+        # Fetch first author's name if only key is provided
+        first_author = data["authors"][0]
+        if isinstance(first_author, dict) and "key" in first_author:
+            author = await _openlibrary_author(first_author["key"])
+        elif isinstance(first_author, dict) and "name" in first_author:
+            author = first_author["name"]
+
+    description = ""
+    if data.get("description"):
+        if isinstance(data["description"], dict):
+            description = data["description"].get("value", "")
+        else:
+            description = str(data["description"])
+
+    return {
+        "title": data.get("title", ""),
+        "author": author,
+        "description": description,
+        "cover_url": f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg" if cover_id else None,
+        "isbn13": isbn if len(isbn) == 13 else None,
+        "isbn10": isbn if len(isbn) == 10 else None,
+        "publisher": (data.get("publishers") or [""])[0],
+        "pages": data.get("number_of_pages"),
+    }
 
+@provider("isbndb", timeout=6.0, enabled=lambda: bool(ISBNDB_API_KEY))
 async def isbndb_lookup(isbn: str = "") -> Optional[Dict]:
-    if not isbn:
+    # ISBNdb API v2 needs a key; without ISBNDB_API_KEY the provider is skipped
+    r = await get_client().get(f"{ISBNDB_URL}/book/{isbn}",
+                               headers={"Authorization": ISBNDB_API_KEY}, timeout=6.0)
+    if r.status_code == 404:
         return None
-    async with httpx.AsyncClient(timeout=6.0, follow_redirects=True) as client:
-        try:
-            r = await client.get(f"https://api.isbndb.com/book/{isbn}")
-            if r.status_code == 200 and "book" in r.json():
-                data = r.json()["book"]
-                return {
-                    "title": data.get("title", ""),
-                    "author": ", ".join(data.get("authors", ["Unknown"])),
-                    "description": data.get("synopsis", ""),
-                    "cover_url": data.get("image", ""),
-                    "isbn13": data.get("isbn13"),
-                    "isbn10": data.get("isbn10"),
-                }
-        except:
-            pass
-    return None
+    r.raise_for_status()
+    if "book" not in r.json():
+        return None
+    data = r.json()["book"]
+    return {
+        "title": data.get("title", ""),
+        "author": ", ".join(data.get("authors", ["Unknown"])),
+        "description": data.get("synopsis", ""),
+        "cover_url": data.get("image", ""),
+        "isbn13": data.get("isbn13"),
+        "isbn10": data.get("isbn10"),
+        "publisher": data.get("publisher", ""),
+        "pages": data.get("pages"),
+    }
+
+async def lookup_all(isbn: str, deadline: float = LOOKUP_DEADLINE) -> Tuple[Dict[str, Optional[Dict]], Optional[str]]:
+    """
+    Ask every provider at once and wait at most ``deadline`` seconds.
+
+    Returns (results, token): results has an entry for each provider that
+    answered in time; the others keep running and can be collected with
+    collect_late(token, name, isbn).  token is None if nothing is late.
+    """
+    tasks = {name: asyncio.ensure_future(lookup(isbn)) for name, lookup in PROVIDERS.items()}
+    await asyncio.wait(tasks.values(), timeout=deadline)
+    results = {name: task.result() for name, task in tasks.items() if task.done()}
+    late = {name: task for name, task in tasks.items() if not task.done()}
+    return results, pending_lookups.add(late) if late else None
+
+async def collect_late(token: str, name: str, isbn: str) -> Optional[Dict]:
+    """The result of a provider lookup_all() gave up waiting for."""
+    task = pending_lookups.get(token, name)
+    if task is None:
+        # Expired, or started by another worker process: ask again (usually a cache hit by now)
+        return await PROVIDERS[name](isbn)
+    # shield: the task is shared, a client going away must not cancel it
+    return await asyncio.shield(task)
+
+def provider_status() -> Dict[str, Dict]:
+    return {name: {
+        "enabled": lookup.enabled(),
+        "breaker": breakers[name].state,
+        "p95_ms": round(latencies[name].p95() * 1000, 1) if latencies[name].p95() is not None else None,
+        "timeout_s": round(latencies[name].timeout(), 3),
+    } for name, lookup in PROVIDERS.items()}
 
 # MASTER LOOKUP — Open Library first (best for niche books)
 async def master_lookup(isbn: str = "") -> Tuple[Optional[Dict], str]:
@@ -107,7 +237,7 @@ async def master_lookup(isbn: str = "") -> Tuple[Optional[Dict], str]:
 def merge_results(openlib: Optional[Dict], google: Optional[Dict], isbndb: Optional[Dict]) -> Dict:
     sources = [r for r in [openlib, google, isbndb] if r]
     merged = {}
-    for key in ["title", "author", "description", "cover_url", "isbn13", "isbn10"]:
+    for key in ["title", "author", "description", "cover_url", "isbn13", "isbn10", "publisher", "pages"]:
         for r in sources:
             if r.get(key):
                 merged[key] = r[key]
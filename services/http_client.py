@@ -0,0 +1,76 @@
+# services/http_client.py — one pooled httpx client shared by every metadata provider
+import os
+from typing import Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401 — httpx only speaks HTTP/2 when the optional h2 package is installed
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Provider base URLs; point them at local stubs (benchmarks/loadtest.py) to test without the real APIs
+GOOGLE_BOOKS_URL = os.environ.get("BOOKTRACKER_GOOGLE_BOOKS_URL", "https://www.googleapis.com").rstrip("/")
+OPENLIBRARY_URL = os.environ.get("BOOKTRACKER_OPENLIBRARY_URL", "https://openlibrary.org").rstrip("/")
+ISBNDB_URL = os.environ.get("BOOKTRACKER_ISBNDB_URL", "https://api2.isbndb.com").rstrip("/")
+
+# Each provider host gets its own connection pool so a stalled host can't
+# starve the others of connections.
+PROVIDER_HOSTS = [
+    GOOGLE_BOOKS_URL,
+    OPENLIBRARY_URL,
+    "https://covers.openlibrary.org",
+    ISBNDB_URL,
+]
+PER_HOST_CONNECTIONS = int(os.environ.get("BOOKTRACKER_HTTP_PER_HOST", 10))
+KEEPALIVE_EXPIRY = float(os.environ.get("BOOKTRACKER_HTTP_KEEPALIVE", 60.0))
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _pooled_transport() -> httpx.AsyncHTTPTransport:
+    limits = httpx.Limits(
+        max_connections=PER_HOST_CONNECTIONS,
+        max_keepalive_connections=PER_HOST_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncHTTPTransport(http2=HTTP2, limits=limits, retries=1)
+
+
+def _build_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    if transport is not None:
+        return httpx.AsyncClient(transport=transport, timeout=DEFAULT_TIMEOUT, follow_redirects=True)
+    return httpx.AsyncClient(
+        transport=_pooled_transport(),
+        mounts={host: _pooled_transport() for host in PROVIDER_HOSTS},
+        timeout=DEFAULT_TIMEOUT,
+        follow_redirects=True,
+        headers={"User-Agent": "BookTracker/1.0"},
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared client; created on first use when the app hasn't started it (CLI scripts)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def start_client(transport: Optional[httpx.AsyncBaseTransport] = None):
+    """FastAPI startup hook.  Pass ``transport`` (e.g. ``httpx.MockTransport``) to stub the network."""
+    global _client
+    if transport is not None:
+        await close_client()
+        _client = _build_client(transport)
+    else:
+        get_client()
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
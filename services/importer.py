@@ -0,0 +1,287 @@
+# services/importer.py — streaming bulk import from CSV, Goodreads and LibraryThing exports
+import csv
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from sqlalchemy import select, or_, insert, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.batch import _guarded
+from database import refresh_statistics
+from models import Book
+from services.isbn_utils import is_valid, to_isbn10, to_isbn13
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Lower-cased export header -> Book column.  Covers our own column names,
+# Goodreads' library export and LibraryThing's CSV/TSV exports.
+HEADER_ALIASES = {
+    "title": "title",
+    "author": "author",
+    "primary author": "author",
+    "author (first, last)": "author",
+    "isbn": "isbn",
+    "isbns": "isbn",
+    "isbn13": "isbn13",
+    "isbn10": "isbn10",
+    "ean": "isbn13",
+    "lccn": "lccn",
+    "description": "description",
+    "summary": "description",
+    "cover_url": "cover_url",
+    "copies": "copies",
+    "owned copies": "copies",
+    "purchase_price": "purchase_price",
+    "purchase price": "purchase_price",
+    "price": "purchase_price",
+    "date_purchased": "date_purchased",
+    "date acquired": "date_purchased",
+    "acquired": "date_purchased",
+    "date_read": "date_read",
+    "date read": "date_read",
+    "comment": "comment",
+    "comments": "comment",
+    "my review": "comment",
+    "review": "comment",
+    "publisher": "publisher",
+    "publication_date": "publication_date",
+    "pages": "pages",
+    "page count": "pages",
+    "number of pages": "pages",
+    "book_format": "book_format",
+    "binding": "book_format",
+    "media": "book_format",
+    "dimensions": "dimensions",
+    "daw_book_number": "daw_book_number",
+    "daw_catalog_number": "daw_catalog_number",
+}
+DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%Y-%m", "%Y"]
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    copies_added: int = 0
+    skipped: int = 0
+    invalid_isbns: int = 0
+    errors: List[str] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> Dict:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "copies_added": self.copies_added,
+            "skipped": self.skipped,
+            "invalid_isbns": self.invalid_isbns,
+            "errors": self.errors[:50],
+            "seconds": round(self.elapsed, 2),
+            "rows_per_second": round(self.rate),
+        }
+
+
+def read_rows(stream: TextIO) -> Iterator[Dict[str, str]]:
+    """Yield export rows with headers mapped to Book columns; comma or tab separated."""
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",\t;")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(stream, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [HEADER_ALIASES.get(h.strip().lower()) for h in header]
+    for values in reader:
+        yield {col: v.strip() for col, v in zip(columns, values) if col and v.strip()}
+
+
+def _clean_isbn(value: str) -> str:
+    # Goodreads wraps ISBNs as ="0441172717" to stop spreadsheets eating the zeros
+    return value.replace("=", "").replace('"', "").replace("-", "").replace(" ", "").upper()
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_row(raw: Dict[str, str], report: ImportReport) -> Optional[Dict]:
+    """Map one export row to Book column values, or None if it can't be imported."""
+    title = raw.get("title")
+    if not title:
+        report.skipped += 1
+        return None
+
+    # LibraryThing lists several ISBNs in one cell; keep the first valid one
+    candidates = [raw.get("isbn13", ""), raw.get("isbn10", "")]
+    candidates += raw.get("isbn", "").replace("[", "").replace("]", "").split(",")
+    isbn13 = isbn10 = None
+    for candidate in filter(None, map(_clean_isbn, candidates)):
+        try:
+            if not is_valid(candidate):
+                raise ValueError(candidate)
+        except ValueError:
+            report.invalid_isbns += 1
+            continue
+        isbn13 = to_isbn13(candidate, validate=False)
+        isbn10 = to_isbn10(candidate, validate=False)
+        break
+
+    try:
+        price = Decimal(raw["purchase_price"].lstrip("$")) if raw.get("purchase_price") else None
+    except InvalidOperation:
+        price = None
+
+    return {
+        "title": title,
+        "author": raw.get("author") or "Unknown",
+        "isbn13": isbn13,
+        "isbn10": isbn10,
+        "lccn": raw.get("lccn"),
+        "description": raw.get("description"),
+        "cover_url": raw.get("cover_url"),
+        "copies": max(1, _parse_int(raw.get("copies")) or 1),
+        "purchase_price": price,
+        "date_purchased": _parse_date(raw.get("date_purchased")),
+        "date_read": _parse_date(raw.get("date_read")),
+        "comment": raw.get("comment"),
+        "publisher": raw.get("publisher"),
+        "publication_date": _parse_date(raw.get("publication_date")),
+        "pages": _parse_int(raw.get("pages")),
+        "book_format": raw.get("book_format"),
+        "dimensions": raw.get("dimensions"),
+        "daw_book_number": _parse_int(raw.get("daw_book_number")),
+        "daw_catalog_number": raw.get("daw_catalog_number"),
+    }
+
+
+async def _merge_batch(db: AsyncSession, books: List[Dict], report: ImportReport):
+    """
+    Merge one batch: a single query finds rows that already exist by either
+    ISBN form, those get their copies bumped with one executemany UPDATE,
+    everything else goes in with one multi-row INSERT.  If the INSERT trips
+    a constraint (say, an LCCN already taken) the books are inserted one by
+    one instead, and only those that still fail are skipped.
+    """
+    conn = await db.connection()
+    # Open the transaction explicitly, so the savepoints below nest inside it
+    await conn.exec_driver_sql("BEGIN IMMEDIATE")
+    # Collapse repeats inside the batch first
+    by_key: Dict[str, Dict] = {}
+    repeats: Dict[str, int] = {}         # ISBN -> copies from later rows folded into the first
+    new_books: List[Dict] = []
+    for book in books:
+        key = book["isbn13"] or book["isbn10"]
+        if key is None:
+            new_books.append(book)
+        elif key in by_key:
+            by_key[key]["copies"] += book["copies"]
+            repeats[key] = repeats.get(key, 0) + book["copies"]
+        else:
+            by_key[key] = book
+
+    existing = {}
+    if by_key:
+        isbn13s = [b["isbn13"] for b in by_key.values() if b["isbn13"]]
+        isbn10s = [b["isbn10"] for b in by_key.values() if b["isbn10"]]
+        rows = await db.execute(select(Book.id, Book.isbn13, Book.isbn10).where(
+            or_(Book.isbn13.in_(isbn13s), Book.isbn10.in_(isbn10s))))
+        for book_id, isbn13, isbn10 in rows:
+            for isbn in (isbn13, isbn10):
+                if isbn:
+                    existing[isbn] = book_id
+
+    increments: Dict[int, int] = {}
+    for book in by_key.values():
+        book_id = existing.get(book["isbn13"]) or existing.get(book["isbn10"])
+        if book_id is None:
+            new_books.append(book)
+        else:
+            increments[book_id] = increments.get(book_id, 0) + book["copies"]
+
+    if increments:
+        table = Book.__table__
+        await db.execute(
+            table.update().where(table.c.id == bindparam("b_id"))
+            .values(copies=table.c.copies + bindparam("b_copies")),
+            [{"b_id": book_id, "b_copies": n} for book_id, n in increments.items()])
+        report.copies_added += sum(increments.values())
+    if new_books:
+        failed = []
+
+        async def insert_all():
+            await conn.execute(insert(Book.__table__), new_books)
+
+        async def insert_one(book: Dict):
+            await conn.execute(insert(Book.__table__), book)
+
+        def fail(book: Dict, error: str):
+            failed.append(book)
+            report.errors.append(f"{book['title']!r}: {error}")
+
+        await _guarded(conn, insert_all, new_books, insert_one, fail)
+        report.created += len(new_books) - len(failed)
+        report.skipped += len(failed)
+        # A new book's repeats are extra copies of it; repeats of an existing book are in increments
+        failed_ids = {id(book) for book in failed}
+        report.copies_added += sum(repeats.get(book["isbn13"] or book["isbn10"], 0)
+                                   for book in new_books if id(book) not in failed_ids)
+    await db.commit()
+
+
+def _batches(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def import_books(db: AsyncSession, stream: TextIO, batch_size: int = DEFAULT_BATCH_SIZE,
+                       progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """
+    Stream an export into the books table, ``batch_size`` rows per transaction.
+
+    Memory stays bounded by the batch size whatever the file size.
+    ``progress`` is called with the running report after every batch.
+    """
+    report = ImportReport()
+    for raw_rows in _batches(read_rows(stream), batch_size):
+        report.rows += len(raw_rows)
+        books = [b for b in (normalize_row(r, report) for r in raw_rows) if b]
+        try:
+            await _merge_batch(db, books, report)
+        except Exception as e:
+            await db.rollback()
+            report.skipped += len(books)
+            report.errors.append(f"rows {report.rows - len(raw_rows) + 1}-{report.rows}: {e}")
+        if progress:
+            progress(report)
+    if report.created:
+        await refresh_statistics(await db.connection())
+        await db.commit()
+    return report
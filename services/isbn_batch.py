@@ -0,0 +1,144 @@
+# services/isbn_batch.py — validate and convert many ISBNs at once
+#
+# The batch twin of services/isbn_utils.  Each input is stripped of spaces
+# and dashes, validated, and converted to both forms.  Failures come back
+# as per-item error codes instead of exceptions, so one bad row doesn't
+# stop a catalog reconciliation.
+#
+# With NumPy installed the work is one vectorized pass over an (n, 13)
+# matrix of code points; without it a plain loop gives identical results.
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from services.isbn_utils import (
+    ISBN13_CHECKS, ISBN10_CHECKS, VALID_PREFIX_ELEMENTS, VALIDATION_ERRORS,
+    isbn13_check_digit, isbn10_check_digit,
+)
+
+try:
+    import numpy as np  # optional: without NumPy the pure-Python path is used
+except ImportError:
+    np = None
+
+# Per-item error codes; the names are the VALIDATION_ERRORS keys
+OK, LENGTH, INVALID, X_IN_13, PREFIX, CHECKSUM = range(6)
+ERROR_NAMES = {LENGTH: "length", INVALID: "invalid", X_IN_13: "13X", PREFIX: "prefix", CHECKSUM: "checksum"}
+_STRIP = str.maketrans("", "", " -")
+
+
+@dataclass
+class BatchResult:
+    """
+    Parallel lists, one entry per input.  ``inputs`` holds each ISBN with
+    spaces and dashes removed; isbn13 and isbn10 are None for invalid ones,
+    and isbn10 is also None for 979 ISBNs, which have no ISBN 10 form.
+    """
+    inputs: List[str]
+    isbn13: List[Optional[str]]
+    isbn10: List[Optional[str]]
+    errors: List[int]
+
+    def message(self, i: int) -> Optional[str]:
+        """The isbn_utils error message for item ``i``, or None if it is valid."""
+        name = ERROR_NAMES.get(self.errors[i])
+        if name is None:
+            return None
+        return VALIDATION_ERRORS[name].format(self.inputs[i][:3])
+
+
+def normalize_batch(isbns: Iterable[str]) -> BatchResult:
+    """Validate ``isbns`` and convert each valid one to both ISBN forms."""
+    cleaned = [str(isbn).translate(_STRIP).upper() for isbn in isbns]
+    if np is None or not cleaned:
+        return _normalize_python(cleaned)
+    return _normalize_numpy(cleaned)
+
+
+def _normalize_python(cleaned: List[str]) -> BatchResult:
+    result = BatchResult(cleaned, [], [], [])
+    for isbn in cleaned:
+        error, isbn13, isbn10 = OK, None, None
+        if len(isbn) not in (10, 13):
+            error = LENGTH
+        elif any(char not in "0123456789X" for char in isbn):
+            error = INVALID
+        elif len(isbn) == 13 and "X" in isbn:
+            error = X_IN_13
+        elif "X" in isbn[:-1]:
+            error = INVALID
+        elif len(isbn) == 13 and isbn[:3] not in VALID_PREFIX_ELEMENTS:
+            error = PREFIX
+        elif len(isbn) == 13:
+            if isbn13_check_digit(isbn[:12]) != isbn[12]:
+                error = CHECKSUM
+            else:
+                isbn13 = isbn
+                isbn10 = isbn[3:12] + isbn10_check_digit(isbn[3:12]) if isbn.startswith("978") else None
+        elif isbn10_check_digit(isbn[:9]) != isbn[9]:
+            error = CHECKSUM
+        else:
+            isbn10 = isbn
+            isbn13 = "978" + isbn[:9] + isbn13_check_digit("978" + isbn[:9])
+        result.errors.append(error)
+        result.isbn13.append(isbn13)
+        result.isbn10.append(isbn10)
+    return result
+
+
+def _normalize_numpy(cleaned: List[str]) -> BatchResult:
+    n = len(cleaned)
+    lengths = np.fromiter(map(len, cleaned), dtype=np.int64, count=n)
+    # Fixed-width matrix of code points; longer inputs are truncated, but
+    # those already fail the length check.  Short rows are zero-padded.
+    codes = np.array(cleaned, dtype="<U13").view(np.uint32).reshape(n, 13).astype(np.int64)
+    is13, is10 = lengths == 13, lengths == 10
+    digits = codes - ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+    is_x = codes == ord("X")
+    position = np.arange(13)
+    in_input = position < lengths[:, None]
+    digits = np.where(is_digit, digits, 0)
+
+    errors = np.zeros(n, dtype=np.int64)
+
+    def mark(mask, code):
+        np.copyto(errors, code, where=mask & (errors == OK))
+
+    mark(~(is13 | is10), LENGTH)
+    mark((in_input & ~is_digit & ~is_x).any(axis=1), INVALID)
+    mark(is13 & is_x.any(axis=1), X_IN_13)
+    mark(is10 & is_x[:, :9].any(axis=1), INVALID)
+    prefix = digits[:, 0] * 100 + digits[:, 1] * 10 + digits[:, 2]
+    mark(is13 & (prefix != 978) & (prefix != 979), PREFIX)
+
+    # ISBN 13: the weighted sum of all 13 digits is a multiple of 10
+    sum13 = digits @ np.array(ISBN13_CHECKS)
+    mark(is13 & (sum13 % 10 != 0), CHECKSUM)
+    # ISBN 10: weights 10..2 on the first nine, then the check digit (X = 10)
+    body10_sum = digits[:, :9] @ np.array(ISBN10_CHECKS)
+    check10 = np.where(is_x[:, 9], 10, digits[:, 9])
+    mark(is10 & ((body10_sum + check10) % 11 != 0), CHECKSUM)
+    valid = errors == OK
+
+    # ISBN 13 for valid ISBN 10s: 978 + first nine + new check digit
+    out13 = np.zeros((n, 13), dtype=np.int64)
+    out13[:, :3] = [9, 7, 8]
+    out13[:, 3:12] = digits[:, :9]
+    out13[:, 12] = (10 - (out13[:, :12] @ np.array(ISBN13_CHECKS[:12])) % 10) % 10
+    out13 = np.where(is13[:, None], digits, out13)
+    # ISBN 10 for valid 978 ISBN 13s: digits 4-12 + new check digit
+    body10 = np.where(is13[:, None], digits[:, 3:12], digits[:, :9])
+    c10 = (11 - (body10 @ np.array(ISBN10_CHECKS)) % 11) % 11
+    out10 = np.zeros((n, 10), dtype=np.int64) + ord("0")
+    out10[:, :9] += body10
+    out10[:, 9] = np.where(c10 == 10, ord("X"), c10 + ord("0"))
+
+    strings13 = (out13 + ord("0")).astype(np.uint32).view("<U13").ravel().tolist()
+    strings10 = out10.astype(np.uint32).view("<U10").ravel().tolist()
+    has10 = valid & (is10 | (prefix == 978))
+    return BatchResult(
+        inputs=cleaned,
+        isbn13=[s if ok else None for s, ok in zip(strings13, valid.tolist())],
+        isbn10=[s if ok else None for s, ok in zip(strings10, has10.tolist())],
+        errors=errors.tolist(),
+    )
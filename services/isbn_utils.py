@@ -15,8 +15,18 @@ VALIDATION_ERRORS = {
     "invalid": "Input has invalid characters.",
     "13X": "ISBN 13 has invalid 'X' character",
     "prefix": "ISBN 13 starts with invalid Prefix Element {}",
+    "checksum": "Check digit does not match.",
     }
 
+def isbn13_check_digit(first12: str) -> str:
+    """The check digit that completes the first 12 digits of an ISBN 13."""
+    return str((10 - sum(a * int(b) for (a, b) in zip(ISBN13_CHECKS, first12)) % 10) % 10)
+
+def isbn10_check_digit(first9: str) -> str:
+    """The check digit (0-9 or X) that completes the first 9 digits of an ISBN 10."""
+    check = (11 - sum(a * int(b) for (a, b) in zip(ISBN10_CHECKS, first9)) % 11) % 11
+    return "X" if check == 10 else str(check)
+
 def is_valid(isbn: str) -> bool:
     """
     Validates an ISBN 10 or 13
@@ -37,13 +47,15 @@ def is_valid(isbn: str) -> bool:
         If isbn has invalid characters or is not of proper length
 
     """
-    stripped = isbn.replace("-", " ").replace(" ", "")
+    stripped = isbn.replace("-", " ").replace(" ", "").upper()
     if len(stripped) not in [10, 13]:
         raise ValueError(VALIDATION_ERRORS["length"])
-    if any(char.upper() not in '01234567890X' for char in stripped):
+    if any(char not in '0123456789X' for char in stripped):
         raise ValueError(VALIDATION_ERRORS["invalid"])
     if "X" in stripped and len(stripped) == 13:
         raise ValueError(VALIDATION_ERRORS["13X"])
+    if "X" in stripped[:-1]:
+        raise ValueError(VALIDATION_ERRORS["invalid"])
     if stripped[:3] not in VALID_PREFIX_ELEMENTS and len(stripped) == 13:
         raise ValueError(VALIDATION_ERRORS["prefix"].format(stripped[:3]))
     if len(stripped) == 13:
@@ -53,7 +65,7 @@ def is_valid(isbn: str) -> bool:
                 for (a, b) in zip(ISBN10_CHECKS, stripped[:-1])) \
                 + int([stripped[-1], '10'][stripped[-1] == "X"])) % 11 == 0
 
-def to_isbn13(isbn: str) -> str:
+def to_isbn13(isbn: str, validate: bool = True) -> str:
     """
     Converts an ISBN 10 to an ISBN 13
 
@@ -61,6 +73,8 @@ def to_isbn13(isbn: str) -> str:
     ----------
     isbn : str
         The ISBN 10
+    validate : bool
+        Pass False when the caller has already checked the ISBN with is_valid()
 
     Returns
     -------
@@ -75,19 +89,17 @@ def to_isbn13(isbn: str) -> str:
     """
 
     # Remove all spaces and dashses
-    isbn10 = isbn.replace(" ", "").replace("-", "")
-    if is_valid(isbn10):
+    isbn10 = isbn.replace(" ", "").replace("-", "").upper()
+    if not validate or is_valid(isbn10):
         if len(isbn10) == 13:
             return isbn10
         if len(isbn10) != 10:
             raise ValueError(VALIDATION_ERRORS['length'])
         isbn13 = "978" + isbn10[:-1]
-        check_digit = str(10 - sum(a * int(b)
-                                   for (a, b) in zip(ISBN13_CHECKS[:-1], isbn13)) % 10)
-        return isbn13 + check_digit
+        return isbn13 + isbn13_check_digit(isbn13)
     return None
 
-def to_isbn10(isbn: str) -> Union[str, None]:
+def to_isbn10(isbn: str, validate: bool = True) -> Union[str, None]:
     """
     Converts an ISBN 13 to an ISBN 10
 
@@ -95,6 +107,8 @@ def to_isbn10(isbn: str) -> Union[str, None]:
     ----------
     isbn : str
         The ISBN 13.
+    validate : bool
+        Pass False when the caller has already checked the ISBN with is_valid()
 
     Returns
     -------
@@ -109,8 +123,8 @@ def to_isbn10(isbn: str) -> Union[str, None]:
         If the input is an invalid ISBN13
 
     """
-    isbn13 = isbn.replace(" ","").replace("-","")
-    if is_valid(isbn13):
+    isbn13 = isbn.replace(" ","").replace("-","").upper()
+    if not validate or is_valid(isbn13):
         if len(isbn13) == 10:
             return isbn13
         if len(isbn13) != 13:
@@ -118,7 +132,5 @@ def to_isbn10(isbn: str) -> Union[str, None]:
         if isbn13[:3] != "978":
             return None
         isbn10 = isbn13[3:-1]
-        check_digit = str(11 - sum(a * int(b)
-                                   for (a, b) in zip(ISBN10_CHECKS, isbn10)) % 11)
-        return isbn10 + check_digit
+        return isbn10 + isbn10_check_digit(isbn10)
     return None
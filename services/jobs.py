@@ -0,0 +1,216 @@
+# services/jobs.py — durable background job queue in the jobs table
+#
+# Requests enqueue work (e.g. a metadata lookup for a book just added) and
+# return at once; a pool of asyncio workers, inside the app or in a separate
+# `manage.py worker` process, runs it.  Claiming a job is one UPDATE ...
+# RETURNING, so any number of workers and processes can share the table.
+# A claimed job carries a lease: if its worker dies, the job is queued again
+# once the lease runs out.  Failed jobs are retried with exponential backoff
+# up to max_attempts.  Only one queued or running job may exist per
+# (kind, key) (ux_jobs_pending_key), which de-duplicates repeated adds of the
+# same ISBN.
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Job
+
+WORKERS = int(os.environ.get("BOOKTRACKER_JOB_WORKERS", 4))   # in-app workers; 0 to use `manage.py worker` only
+LEASE_SECONDS = 120.0
+POLL_SECONDS = 2.0
+BACKOFF_BASE = 30.0          # first retry after ~30s, then 60s, 120s ...
+BACKOFF_MAX = 3600.0
+
+# kind -> coroutine run with the job's book_id and key; returns a JSON-able result
+HANDLERS: Dict[str, Callable[[Optional[int], str], Awaitable[object]]] = {}
+
+
+def handler(kind: str):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+@handler("enrich")
+async def _enrich(book_id: Optional[int], key: str):
+    from services.enrichment import enrich_book   # enrichment imports the providers; keep this module light
+    return {"updated": sorted(await enrich_book(book_id))}
+
+
+@handler("dedupe")
+async def _dedupe(book_id: Optional[int], key: str):
+    from services.dedupe import refresh_keys
+    async with AsyncSessionLocal() as db:
+        return {"indexed": await refresh_keys(db)}
+
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _wake():
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def enqueue(db: AsyncSession, kind: str, key: str, book_id: Optional[int] = None,
+                  max_attempts: int = 5) -> bool:
+    """
+    Queue a job and commit.  Returns False if an identical job (same kind
+    and key) is already queued or running.
+    """
+    result = await db.execute(text("""
+        INSERT INTO jobs (kind, key, book_id, status, attempts, max_attempts, run_after)
+        VALUES (:kind, :key, :book_id, 'queued', 0, :max_attempts, :now)
+        ON CONFLICT (kind, key) WHERE status IN ('queued', 'running') DO NOTHING
+    """), {"kind": kind, "key": key, "book_id": book_id, "max_attempts": max_attempts, "now": time.time()})
+    await db.commit()
+    if result.rowcount:
+        _wake()
+    return bool(result.rowcount)
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number ``attempts``: doubling from BACKOFF_BASE, with jitter."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.75, 1.25)
+
+
+async def _claim() -> Optional[Job]:
+    now = time.time()
+    async with AsyncSessionLocal() as db:
+        # An idle queue is checked with a read, so idle workers never take the write lock
+        due = (await db.execute(text("""
+            SELECT EXISTS (SELECT 1 FROM jobs WHERE status = 'queued' AND run_after <= :now)
+                OR EXISTS (SELECT 1 FROM jobs WHERE status = 'running' AND locked_until < :now)
+        """), {"now": now})).scalar()
+        await db.rollback()
+        if not due:
+            return None
+        # Leases that ran out belong to workers that died; their jobs go back in the queue
+        await db.execute(text("""
+            UPDATE jobs SET status = 'queued', updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND locked_until < :now
+        """), {"now": now})
+        claimed = (await db.execute(select(Job).from_statement(text("""
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = :lease,
+                            updated_at = CURRENT_TIMESTAMP
+            WHERE id = (SELECT id FROM jobs WHERE status = 'queued' AND run_after <= :now
+                        ORDER BY run_after, id LIMIT 1)
+            RETURNING *
+        """).columns(*Job.__table__.columns)), {"now": now, "lease": now + LEASE_SECONDS})).scalar_one_or_none()
+        await db.commit()
+        return claimed
+
+
+async def _finish(job: Job, error: Optional[BaseException] = None, result=None):
+    values = {"id": job.id}
+    if error is None:
+        values.update(status="done", result=json.dumps(result), last_error=None, run_after=time.time())
+    elif job.attempts >= job.max_attempts:
+        values.update(status="failed", result=None, last_error=repr(error), run_after=time.time())
+    else:
+        values.update(status="queued", result=None, last_error=repr(error), run_after=time.time() + backoff(job.attempts))
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("""
+            UPDATE jobs SET status = :status, result = :result, last_error = :last_error, run_after = :run_after,
+                            locked_until = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = :id
+        """), values)
+        await db.commit()
+
+
+async def run_one() -> bool:
+    """Claim and run one due job.  Returns False if none was due."""
+    job = await _claim()
+    if job is None:
+        return False
+    run = HANDLERS.get(job.kind)
+    try:
+        if run is None:
+            raise LookupError(f"no handler for job kind {job.kind!r}")
+        result = await asyncio.wait_for(run(job.book_id, job.key), LEASE_SECONDS)
+    except asyncio.CancelledError:
+        # Shutting down: let another worker pick it up right away, without counting the attempt
+        await asyncio.shield(_release(job))
+        raise
+    except Exception as e:
+        print(f"job {job.id} ({job.kind} {job.key}) attempt {job.attempts} failed: {e!r}")
+        await _finish(job, error=e)
+    else:
+        await _finish(job, result=result)
+    return True
+
+
+async def _release(job: Job):
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("""
+            UPDATE jobs SET status = 'queued', attempts = attempts - 1, locked_until = NULL,
+                            updated_at = CURRENT_TIMESTAMP
+            WHERE id = :id AND status = 'running'
+        """), {"id": job.id})
+        await db.commit()
+
+
+async def _worker():
+    while True:
+        try:
+            if await run_one():
+                continue
+        except Exception as e:  # the database itself failing: don't spin
+            print(f"job worker error: {e!r}")
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+_tasks: List[asyncio.Task] = []
+
+
+async def start_workers(count: int = WORKERS):
+    """Start ``count`` workers in this event loop (FastAPI startup hook)."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    _tasks.extend(asyncio.create_task(_worker()) for _ in range(count))
+
+
+async def stop_workers():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+async def job_status(db: AsyncSession, book_id: int) -> List[Dict]:
+    """Every job for a book, newest first."""
+    jobs = (await db.execute(select(Job).where(Job.book_id == book_id).order_by(Job.id.desc()))).scalars()
+    return [_describe(j) for j in jobs]
+
+
+async def queue_summary(db: AsyncSession) -> Dict[str, int]:
+    rows = await db.execute(text("SELECT status, count(*) FROM jobs GROUP BY status"))
+    return {status: count for status, count in rows}
+
+
+def _describe(job: Job) -> Dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "key": job.key,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "next_attempt_in": round(max(0.0, job.run_after - time.time()), 1) if job.status == "queued" else None,
+        "last_error": job.last_error,
+        "result": json.loads(job.result) if job.result else None,
+        "updated_at": str(job.updated_at),
+    }
@@ -0,0 +1,157 @@
+# services/lookup_cache.py — persistent SQLite cache for metadata provider lookups
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from database import DATABASE_PATH
+from services.isbn_utils import to_isbn13
+
+CACHE_PATH = os.environ.get(
+    "BOOKTRACKER_LOOKUP_CACHE",
+    os.path.join(os.path.dirname(DATABASE_PATH) or ".", "lookup_cache.db"),
+)
+TTL_SECONDS = int(os.environ.get("BOOKTRACKER_LOOKUP_TTL", 30 * 24 * 3600))
+NEGATIVE_TTL_SECONDS = int(os.environ.get("BOOKTRACKER_LOOKUP_NEGATIVE_TTL", 24 * 3600))
+MAX_ENTRIES = int(os.environ.get("BOOKTRACKER_LOOKUP_CACHE_SIZE", 50_000))
+
+
+def cache_key(isbn: str) -> str:
+    """Normalize an ISBN so the 10 and 13 digit forms share one cache entry."""
+    stripped = isbn.replace("-", "").replace(" ", "").upper()
+    try:
+        return to_isbn13(stripped) or stripped
+    except ValueError:
+        return stripped
+
+
+class LookupCache:
+    """
+    Provider results keyed by (provider, ISBN-13).
+
+    A stored ``None`` is a negative entry: the provider answered but had no
+    such book.  Negative entries expire sooner than positive ones.  The
+    table size is checked every ``max_entries // 100`` stores; past
+    ``max_entries`` the least recently read rows are evicted.
+
+    get() and put() run the SQLite work in a thread: under serve.py the file
+    is shared by every worker, and waiting out another's write lock
+    (busy_timeout) must not stall the event loop.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = TTL_SECONDS,
+                 negative_ttl: int = NEGATIVE_TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._check_every = max(1, max_entries // 100)
+        self._stores_since_check = 0
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")   # shared by every worker process under serve.py
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lookup_cache (
+                    provider TEXT NOT NULL,
+                    isbn13 TEXT NOT NULL,
+                    payload TEXT,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (provider, isbn13)
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_lookup_cache_last_access ON lookup_cache (last_access)")
+            self._conn = conn
+        return self._conn
+
+    def _count(self, provider: str, name: str, n: int = 1):
+        per_provider = self.counters.setdefault(
+            provider, {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+        per_provider[name] += n
+
+    async def get(self, provider: str, isbn: str) -> Tuple[bool, Optional[Dict]]:
+        """Return ``(hit, value)``; ``value`` is ``None`` for a cached miss."""
+        return await asyncio.to_thread(self._get, provider, isbn)
+
+    async def put(self, provider: str, isbn: str, value: Optional[Dict]):
+        await asyncio.to_thread(self._put, provider, isbn, value)
+
+    def _get(self, provider: str, isbn: str) -> Tuple[bool, Optional[Dict]]:
+        key = cache_key(isbn)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload, expires_at FROM lookup_cache WHERE provider = ? AND isbn13 = ?",
+                (provider, key)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    conn.execute("DELETE FROM lookup_cache WHERE provider = ? AND isbn13 = ?", (provider, key))
+                self._count(provider, "misses")
+                return False, None
+            conn.execute("UPDATE lookup_cache SET last_access = ? WHERE provider = ? AND isbn13 = ?",
+                         (now, provider, key))
+        if row[0] is None:
+            self._count(provider, "negative_hits")
+            return True, None
+        self._count(provider, "hits")
+        return True, json.loads(row[0])
+
+    def _put(self, provider: str, isbn: str, value: Optional[Dict]):
+        key = cache_key(isbn)
+        now = time.time()
+        ttl = self.ttl if value is not None else self.negative_ttl
+        payload = json.dumps(value) if value is not None else None
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO lookup_cache (provider, isbn13, payload, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)", (provider, key, payload, now + ttl, now))
+            self._count(provider, "stores")
+            # count(*) reads the whole table, so only every so often; other
+            # worker processes' stores are caught by the same check
+            self._stores_since_check += 1
+            if self._stores_since_check < self._check_every:
+                return
+            self._stores_since_check = 0
+            excess = conn.execute("SELECT count(*) FROM lookup_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM lookup_cache WHERE rowid IN "
+                    "(SELECT rowid FROM lookup_cache ORDER BY last_access LIMIT ?)", (excess,))
+                self._count(provider, "evictions", excess)
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM lookup_cache")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, negative = self._connect().execute(
+                "SELECT count(*), count(*) - count(payload) FROM lookup_cache").fetchone()
+        totals = {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        for per_provider in self.counters.values():
+            for name, n in per_provider.items():
+                totals[name] += n
+        lookups = totals["hits"] + totals["negative_hits"] + totals["misses"]
+        return {
+            "entries": entries,
+            "negative_entries": negative,
+            "max_entries": self.max_entries,
+            "hit_ratio": round((totals["hits"] + totals["negative_hits"]) / lookups, 4) if lookups else 0.0,
+            "upstream_calls_saved": totals["hits"] + totals["negative_hits"],
+            "totals": totals,
+            "providers": self.counters,
+        }
+
+
+lookup_cache = LookupCache()
@@ -0,0 +1,159 @@
+# services/metrics.py — in-process request, query and provider metrics in Prometheus text format
+import os
+import re
+import threading
+import time
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Opt-in: log any statement slower than this many ms, with its EXPLAIN QUERY PLAN
+SLOW_QUERY_MS = float(os.environ.get("BOOKTRACKER_SLOW_QUERY_MS", 0))
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(key)} {value:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.buckets = name, help, buckets
+        self.series: Dict[LabelKey, list] = {}   # key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self.series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%g"' % bound
+                yield f"{self.name}_bucket{_format_labels(key, le)} {count}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(key, le)} {series[-2]}"
+            yield f"{self.name}_sum{_format_labels(key)} {series[-1]:.6f}"
+            yield f"{self.name}_count{_format_labels(key)} {series[-2]}"
+
+
+request_duration = Histogram("booktracker_http_request_duration_seconds",
+                             "HTTP request latency by route template")
+query_duration = Histogram("booktracker_db_query_duration_seconds",
+                           "SQL statement latency by operation and table")
+query_rows = Counter("booktracker_db_query_rows_total",
+                     "Rows read by SELECT and written by INSERT/UPDATE/DELETE statements")
+provider_duration = Histogram("booktracker_provider_call_duration_seconds",
+                              "Upstream metadata provider call latency (cache misses only)")
+provider_calls = Counter("booktracker_provider_calls_total",
+                         "Metadata provider lookups by outcome: hit, negative_hit, found, not_found, error, short_circuited, local")
+page_cache = Counter("booktracker_page_cache_total",
+                     "Rendered page and row fragment cache lookups by kind and outcome: hit, shared_hit, miss, not_modified")
+
+REGISTRY = [request_duration, query_duration, query_rows, provider_duration, provider_calls, page_cache]
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+\"?(\w+)", re.IGNORECASE)
+
+
+def statement_label(statement: str) -> str:
+    """'SELECT books', 'UPDATE books', 'PRAGMA' ... — low-cardinality name for a SQL statement."""
+    words = statement.lstrip().split(None, 1)
+    operation = words[0].upper() if words else "?"
+    if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        return operation
+    table = _TABLE.search(statement)
+    return f"{operation} {table.group(1)}" if table else operation
+
+
+def _rows(cursor) -> int:
+    """
+    Rows a statement read or wrote, or -1 if unknown.  The aiosqlite adapter
+    fetches a query's rows into the cursor during execute, so they can be
+    counted before the caller reads them; streamed (server-side) results can't.
+    """
+    if cursor.description is None:
+        return cursor.rowcount
+    rows = getattr(cursor, "_rows", None)
+    return -1 if rows is None or getattr(cursor, "server_side", False) else len(rows)
+
+
+def instrument_engine(engine):
+    """Time every statement run through ``engine`` (an AsyncEngine) and log slow ones if enabled."""
+    sync_engine = engine.sync_engine
+
+    # The start time lives on the execution context, which is discarded with
+    # a statement that fails, so a failure can't skew the next timing
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_start", None)
+        if started is None or statement.lstrip().upper().startswith("EXPLAIN"):
+            return  # our own slow-query plans
+        elapsed = time.perf_counter() - started
+        label = statement_label(statement)
+        query_duration.observe(elapsed, statement=label)
+        rows = _rows(cursor)
+        if rows >= 0:
+            query_rows.inc(rows, statement=label)
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            _log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+
+def _log_slow_query(conn, statement, parameters, executemany, elapsed):
+    print(f"Slow query ({elapsed * 1000:.1f} ms): {statement.strip()}  params={parameters!r}"[:2000])
+    if executemany or not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")):
+        return
+    try:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        for row in plan:
+            print(f"    plan: {row[-1]}")
+    except Exception as e:
+        print(f"    plan unavailable: {e}")
@@ -0,0 +1,254 @@
+# services/openlibrary_local.py — offline Open Library index built from the bulk dumps
+#
+# Open Library publishes editions and authors dumps
+# (https://openlibrary.org/developers/dumps): gzipped, one record per line,
+#
+#   type <TAB> key <TAB> revision <TAB> last_modified <TAB> JSON
+#
+# import_dump() streams one through in constant memory and keeps only what
+# a lookup needs, in a separate SQLite file keyed by ISBN-13.  Both tables
+# are WITHOUT ROWID, so a lookup is one primary-key probe per table, and the
+# file is read through mmap.  openlibrary_lookup asks this index first and
+# only goes to the network on a miss.
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, IO, List, Optional
+
+from database import DATABASE_PATH
+from services.isbn_batch import normalize_batch
+from services.isbn_utils import to_isbn10
+from services.lookup_cache import cache_key
+
+INDEX_PATH = os.environ.get(
+    "BOOKTRACKER_OPENLIBRARY_INDEX",
+    os.path.join(os.path.dirname(DATABASE_PATH) or ".", "openlibrary.db"),
+)
+MMAP_SIZE = int(os.environ.get("BOOKTRACKER_OPENLIBRARY_MMAP", 1 << 30))
+DEFAULT_BATCH_SIZE = 10_000
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS ol_editions (
+        isbn13 TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        author_key TEXT,
+        by_statement TEXT,
+        publisher TEXT,
+        pages INTEGER,
+        cover_id INTEGER,
+        description TEXT
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS ol_authors (
+        key TEXT PRIMARY KEY,
+        name TEXT NOT NULL
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS ol_dumps (
+        path TEXT PRIMARY KEY,
+        editions INTEGER NOT NULL,
+        authors INTEGER NOT NULL,
+        imported_at REAL NOT NULL
+    )""",
+]
+
+LOOKUP_SQL = """
+    SELECT e.isbn13, e.title, e.by_statement, a.name, e.publisher, e.pages, e.cover_id, e.description
+    FROM ol_editions e LEFT JOIN ol_authors a ON a.key = e.author_key
+    WHERE e.isbn13 = ?
+"""
+
+
+@dataclass
+class DumpReport:
+    lines: int = 0
+    editions: int = 0
+    authors: int = 0
+    skipped: int = 0
+    bytes_read: int = 0
+    total_bytes: int = 0
+    started: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.lines / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.lines:,} lines: {self.editions:,} editions, {self.authors:,} authors indexed, "
+                f"{self.skipped:,} skipped ({self.rate:,.0f} lines/s)")
+
+
+def _text(value) -> Optional[str]:
+    # Descriptions and notes are either a string or {"type": "/type/text", "value": ...}
+    if isinstance(value, dict):
+        value = value.get("value")
+    return str(value) if value else None
+
+
+def _edition_rows(records: List[Dict]) -> List[tuple]:
+    """One row per valid ISBN; an edition listing both forms of the same ISBN yields one row."""
+    candidates, owners = [], []
+    for i, record in enumerate(records):
+        for isbn in (record.get("isbn_13") or []) + (record.get("isbn_10") or []):
+            candidates.append(str(isbn))
+            owners.append(i)
+    isbns = normalize_batch(candidates).isbn13
+    rows = {}
+    for isbn13, i in zip(isbns, owners):
+        if isbn13 is None or isbn13 in rows:
+            continue
+        record = records[i]
+        authors = record.get("authors") or [{}]
+        author_key = authors[0].get("key") if isinstance(authors[0], dict) else None
+        rows[isbn13] = (
+            isbn13,
+            record.get("title") or "",
+            author_key,
+            record.get("by_statement"),
+            (record.get("publishers") or [None])[0],
+            record.get("number_of_pages") if isinstance(record.get("number_of_pages"), int) else None,
+            next((c for c in record.get("covers") or [] if isinstance(c, int) and c > 0), None),
+            _text(record.get("description")),
+        )
+    return list(rows.values())
+
+
+def _open_dump(path: str, raw: IO[bytes]) -> IO[str]:
+    stream = gzip.GzipFile(fileobj=raw) if path.endswith(".gz") else raw
+    return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+
+
+def import_dump(path: str, index_path: str = INDEX_PATH, batch_size: int = DEFAULT_BATCH_SIZE,
+                progress: Optional[Callable[[DumpReport], None]] = None) -> DumpReport:
+    """
+    Stream an editions, authors or "all types" dump into the index.
+
+    Memory stays flat: records are parsed and written ``batch_size`` at a
+    time.  Re-importing a newer dump replaces existing rows.
+    """
+    report = DumpReport(total_bytes=os.path.getsize(path), started=time.perf_counter())
+    conn = sqlite3.connect(index_path, isolation_level=None)
+    # The index can always be rebuilt from the dump, so trade durability for speed
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    for ddl in SCHEMA:
+        conn.execute(ddl)
+
+    editions: List[Dict] = []
+    authors: List[tuple] = []
+
+    def flush():
+        rows = _edition_rows(editions)
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO ol_editions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT OR REPLACE INTO ol_authors VALUES (?, ?)", authors)
+        conn.execute("COMMIT")
+        report.editions += len(rows)
+        report.authors += len(authors)
+        editions.clear()
+        authors.clear()
+        report.bytes_read = raw.tell()
+        if progress:
+            progress(report)
+
+    with open(path, "rb") as raw:
+        # Keep a reference: a collected wrapper closes ``raw``, which the last flush() still reads
+        lines = _open_dump(path, raw)
+        for line in lines:
+            report.lines += 1
+            fields = line.rstrip("\n").split("\t", 4)
+            if len(fields) != 5 or fields[0] not in ("/type/edition", "/type/author"):
+                report.skipped += 1
+                continue
+            try:
+                record = json.loads(fields[4])
+            except ValueError:
+                report.skipped += 1
+                continue
+            if fields[0] == "/type/edition":
+                if record.get("isbn_13") or record.get("isbn_10"):
+                    editions.append(record)
+                else:
+                    report.skipped += 1
+            elif record.get("name"):
+                authors.append((fields[1], record["name"]))
+            if len(editions) + len(authors) >= batch_size:
+                flush()
+        flush()
+
+    conn.execute("INSERT OR REPLACE INTO ol_dumps VALUES (?, ?, ?, ?)",
+                 (os.path.abspath(path), report.editions, report.authors, time.time()))
+    # Back to a rollback journal so read-only connections need no -wal/-shm files
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+    openlibrary_index.reset()
+    return report
+
+
+class OpenLibraryIndex:
+    """Read side of the index.  Every method is a no-op miss until a dump has been imported."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            if not os.path.exists(self.path):
+                return None
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            try:
+                conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+                conn.execute("SELECT 1 FROM ol_editions LIMIT 1")
+            except sqlite3.OperationalError:
+                conn.close()  # still being created by a first import
+                return None
+            self._conn = conn
+        return self._conn
+
+    def reset(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, isbn: str) -> Optional[Dict]:
+        """The openlibrary_lookup result for ``isbn``, or None if the index doesn't have it."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            row = conn.execute(LOOKUP_SQL, (cache_key(isbn),)).fetchone()
+        if row is None:
+            return None
+        isbn13, title, by_statement, author, publisher, pages, cover_id, description = row
+        return {
+            "title": title,
+            "author": by_statement or author or "Unknown",
+            "description": description or "",
+            "cover_url": f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg" if cover_id else None,
+            "isbn13": isbn13,
+            "isbn10": to_isbn10(isbn13, validate=False),
+            "publisher": publisher or "",
+            "pages": pages,
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return {"path": self.path, "available": False}
+            dumps = conn.execute("SELECT path, editions, authors, imported_at FROM ol_dumps").fetchall()
+        return {
+            "path": self.path,
+            "available": True,
+            "dumps": [dict(zip(("path", "editions", "authors", "imported_at"), d)) for d in dumps],
+        }
+
+
+openlibrary_index = OpenLibraryIndex()
@@ -0,0 +1,331 @@
+# services/page_cache.py — cache of rendered home() pages and book row fragments
+#
+# With several worker processes (serve.py), every process must see every
+# write, or a process that didn't handle it keeps serving the old page.
+# BOOKTRACKER_CACHE_BACKEND=sqlite keeps the generation counter, the log of
+# which books each write touched, and the rendered pages in a SQLite file
+# all workers open; each process still keeps its own LRU in front of it.
+#
+# manage.py writes from a process of its own, whichever backend the server
+# uses.  It bumps books.db's PRAGMA user_version after writing; the server
+# checks that number whenever it reads the generation, and drops everything
+# cached when it has moved.
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import DATABASE_PATH
+from services import metrics
+
+MAX_PAGES = int(os.environ.get("BOOKTRACKER_PAGE_CACHE_SIZE", 256))
+MAX_FRAGMENTS = int(os.environ.get("BOOKTRACKER_FRAGMENT_CACHE_SIZE", 10_000))
+CACHE_BACKEND = os.environ.get("BOOKTRACKER_CACHE_BACKEND", "memory")   # "memory" or "sqlite"
+SHARED_PATH = os.environ.get(
+    "BOOKTRACKER_PAGE_CACHE_PATH",
+    os.path.join(os.path.dirname(DATABASE_PATH) or ".", "page_cache.db"),
+)
+# Writes remembered in the shared log; a process further behind than this drops all its fragments
+KEEP_CHANGES = 10_000
+
+SHARED_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS cache_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        boot TEXT NOT NULL,
+        generation INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS cache_changes (
+        generation INTEGER NOT NULL,
+        book_id INTEGER NOT NULL,
+        PRIMARY KEY (generation, book_id)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS cache_pages (
+        key TEXT PRIMARY KEY,
+        generation INTEGER NOT NULL,
+        body BLOB NOT NULL
+    )""",
+]
+
+
+def _boot_token() -> str:
+    return format(int(time.time() * 1000), "x")
+
+
+class SharedState:
+    """The generation counter, the write log and rendered pages, in a SQLite file shared by processes."""
+
+    def __init__(self, path: str = SHARED_PATH, max_pages: int = MAX_PAGES):
+        self.path = path
+        self.max_pages = max_pages
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            for ddl in SHARED_SCHEMA:
+                conn.execute(ddl)
+            conn.execute("INSERT OR IGNORE INTO cache_state (id, boot, generation) VALUES (1, ?, 0)",
+                         (_boot_token(),))
+            self._conn = conn
+        return self._conn
+
+    def reset(self):
+        """Empty the cache and start a new boot token; the launcher calls this before starting workers."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_changes")
+            conn.execute("DELETE FROM cache_pages")
+            conn.execute("UPDATE cache_state SET boot = ?, generation = 0", (_boot_token(),))
+            conn.execute("COMMIT")
+
+    def bump(self, book_ids) -> int:
+        """Record a write touching ``book_ids``.  Returns the new generation."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            generation = conn.execute(
+                "UPDATE cache_state SET generation = generation + 1 RETURNING generation").fetchone()[0]
+            conn.executemany("INSERT OR IGNORE INTO cache_changes VALUES (?, ?)",
+                             [(generation, book_id) for book_id in book_ids])
+            conn.execute("DELETE FROM cache_changes WHERE generation <= ?", (generation - KEEP_CHANGES,))
+            conn.execute("COMMIT")
+        return generation
+
+    def poll(self, generation: int) -> Tuple[str, int, List[Tuple[int, int]]]:
+        """
+        The boot token, the current generation and (generation, book id) of
+        every write logged after ``generation``, read in one transaction.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                boot, current = conn.execute("SELECT boot, generation FROM cache_state").fetchone()
+                changes = []
+                if 0 < current - generation <= KEEP_CHANGES:
+                    changes = conn.execute(
+                        "SELECT generation, book_id FROM cache_changes WHERE generation > ?", (generation,)).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        return boot, current, changes
+
+    def get_page(self, key: str, generation: int) -> Optional[bytes]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT body FROM cache_pages WHERE key = ? AND generation = ?", (key, generation)).fetchone()
+        return row[0] if row else None
+
+    def put_page(self, key: str, generation: int, body: bytes):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR REPLACE INTO cache_pages (key, generation, body) VALUES (?, ?, ?)",
+                         (key, generation, body))
+            # Pages from older generations can never be served again
+            conn.execute("DELETE FROM cache_pages WHERE generation < ?", (generation,))
+            conn.execute("DELETE FROM cache_pages WHERE rowid IN "
+                         "(SELECT rowid FROM cache_pages ORDER BY rowid DESC LIMIT -1 OFFSET ?)", (self.max_pages,))
+            conn.execute("COMMIT")
+
+    def page_count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT count(*) FROM cache_pages").fetchone()[0]
+
+
+class DatabaseVersion:
+    """books.db's PRAGMA user_version, which processes other than the server bump after writing books."""
+
+    def __init__(self, path: str = DATABASE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._conn = conn
+        return self._conn
+
+    def read(self) -> int:
+        # Read from the database header: no table is touched
+        with self._lock:
+            return self._connect().execute("PRAGMA user_version").fetchone()[0]
+
+    def bump(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0] + 1
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        return version
+
+
+class PageCache:
+    """
+    Rendered pages and per-book table rows, invalidated by a generation counter.
+
+    Every write bumps the generation.  A page is only served for the
+    generation it was rendered at, since any insert, edit or delete can
+    change which books land on which page.  A row fragment depends on one
+    book, so it stays valid until that book itself is written.
+
+    Callers read the generation *before* querying and store entries under
+    that value: a write that lands while a render is in flight then makes
+    the entry stale instead of caching old data as current.
+
+    With ``shared``, reading the generation also catches up on writes made
+    by other processes, dropping the fragments of the books they touched.
+    Its SQLite work runs in a thread: with several workers writing the file,
+    waiting for its lock must not stall the event loop.
+
+    With ``database``, reading the generation also notices writes published
+    by manage.py and drops everything.  Set ``publish`` in such a process:
+    invalidate() then bumps the database version for the server to see.
+    The version is read and bumped in a thread too, since books.db's lock
+    is held for the length of every import batch.
+    """
+
+    def __init__(self, max_pages: int = MAX_PAGES, max_fragments: int = MAX_FRAGMENTS,
+                 shared: Optional[SharedState] = None, database: Optional[DatabaseVersion] = None):
+        self.max_pages = max_pages
+        self.max_fragments = max_fragments
+        self.shared = shared
+        self.database = database
+        self.publish = False
+        self._database_version: Optional[int] = None
+        self._generation = 0
+        # Part of every ETag, so tags from before a restart never match
+        self._boot = _boot_token()
+        self._pages: "OrderedDict[str, tuple]" = OrderedDict()        # key -> (generation, body)
+        self._fragments: "OrderedDict[int, tuple]" = OrderedDict()    # book id -> (generation, html)
+        self._changed: Dict[int, int] = {}                            # book id -> generation of its last write
+
+    async def current_generation(self) -> int:
+        if self.database is not None:
+            await self._check_database()
+        if self.shared is not None:
+            await self._sync()
+        return self._generation
+
+    async def _check_database(self):
+        version = await asyncio.to_thread(self.database.read)
+        known, self._database_version = self._database_version, max(version, self._database_version or 0)
+        if known is None or version <= known:
+            return  # first read, unchanged, or read before a bump of our own that finished first
+        # Written by another program; which books it touched isn't known
+        self._pages.clear()
+        self._fragments.clear()
+        self._changed.clear()
+        if self.shared is not None:
+            # So pages other workers stored in the shared file aren't served
+            await asyncio.to_thread(self.shared.bump, ())
+        else:
+            self._generation += 1
+
+    async def _sync(self):
+        boot, current, changes = await asyncio.to_thread(self.shared.poll, self._generation)
+        if boot != self._boot or current - self._generation > KEEP_CHANGES:
+            # Reset by the launcher, or too far behind to replay the log
+            self._boot = boot
+            self._pages.clear()
+            self._fragments.clear()
+            self._changed.clear()
+        elif current <= self._generation:
+            return  # nothing new, or a poll overtaken by a later one while in its thread
+        else:
+            for generation, book_id in changes:
+                self._changed[book_id] = generation
+                self._fragments.pop(book_id, None)
+        self._generation = current
+
+    async def invalidate(self, *book_ids: int):
+        """Record a write; pass the ids of the books it touched, if known."""
+        if self.publish and self.database is not None:
+            self._database_version = await asyncio.to_thread(self.database.bump)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.bump, book_ids)
+            await self._sync()
+            return
+        self._generation += 1
+        for book_id in book_ids:
+            self._changed[book_id] = self._generation
+            self._fragments.pop(book_id, None)
+
+    def etag(self, generation: int) -> str:
+        return f'"{self._boot}-{generation}"'
+
+    async def get_page(self, key: str, generation: int) -> Optional[bytes]:
+        entry = self._pages.get(key)
+        if entry is not None and entry[0] == generation:
+            self._pages.move_to_end(key)
+            metrics.page_cache.inc(kind="page", outcome="hit")
+            return entry[1]
+        body = None
+        if self.shared is not None:
+            body = await asyncio.to_thread(self.shared.get_page, key, generation)
+        if body is None:
+            metrics.page_cache.inc(kind="page", outcome="miss")
+            return None
+        # Rendered by another worker
+        self._remember_page(key, generation, body)
+        metrics.page_cache.inc(kind="page", outcome="shared_hit")
+        return body
+
+    async def put_page(self, key: str, generation: int, body: bytes):
+        if generation != await self.current_generation():
+            return  # written to while rendering
+        self._remember_page(key, generation, body)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.put_page, key, generation, body)
+
+    def _remember_page(self, key: str, generation: int, body: bytes):
+        self._pages[key] = (generation, body)
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    def fragment(self, book_id: int, generation: int, render: Callable[[], str]) -> str:
+        """The cached row for ``book_id`` if still valid, otherwise ``render()`` it and cache that."""
+        entry = self._fragments.get(book_id)
+        if entry is not None:
+            self._fragments.move_to_end(book_id)
+            metrics.page_cache.inc(kind="fragment", outcome="hit")
+            return entry[1]
+        metrics.page_cache.inc(kind="fragment", outcome="miss")
+        html = render()
+        if generation >= self._changed.get(book_id, 0):
+            self._fragments[book_id] = (generation, html)
+            self._fragments.move_to_end(book_id)
+            while len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return html
+
+    async def clear(self):
+        self._pages.clear()
+        self._fragments.clear()
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.reset)
+
+    async def stats(self) -> Dict:
+        stats = {
+            "backend": "sqlite" if self.shared is not None else "memory",
+            "generation": await self.current_generation(),
+            "pages": len(self._pages),
+            "fragments": len(self._fragments),
+        }
+        if self.shared is not None:
+            stats["shared_pages"] = await asyncio.to_thread(self.shared.page_count)
+        return stats
+
+
+page_cache = PageCache(shared=SharedState() if CACHE_BACKEND == "sqlite" else None, database=DatabaseVersion())
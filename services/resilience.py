@@ -0,0 +1,150 @@
+# services/resilience.py — circuit breakers, adaptive timeouts and hedging for provider calls
+import asyncio
+import math
+import secrets
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """
+    Stop calling a provider that keeps failing.
+
+    Closed: calls go through, failures are counted over the last ``window``
+    seconds.  ``threshold`` failures in the window open the breaker, and
+    calls are refused for ``cooldown`` seconds.  After that one trial call
+    is let through (half-open): success closes the breaker, failure opens
+    it for another cooldown.
+    """
+
+    def __init__(self, threshold: int = 5, window: float = 60.0, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._failures: Deque[float] = deque()
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self._failures.clear()
+        self._opened_at = None
+        self._trial_running = False
+
+    def record_cancelled(self):
+        """The call was abandoned before it finished; let a later call be the half-open trial."""
+        self._trial_running = False
+
+    def record_failure(self):
+        now = time.monotonic()
+        if self._trial_running or self._opened_at is not None:
+            self._opened_at = now  # failed trial: back to open for another cooldown
+            self._trial_running = False
+            return
+        self._failures.append(now)
+        while self._failures and self._failures[0] < now - self.window:
+            self._failures.popleft()
+        if len(self._failures) >= self.threshold:
+            self._opened_at = now
+            self._failures.clear()
+
+
+class LatencyTracker:
+    """
+    Recent successful call durations, and the timeout and hedge delay they suggest.
+
+    Until ``min_samples`` calls have been seen the configured ``ceiling`` is
+    the timeout.  After that it is ``multiplier`` x p95, kept between
+    ``floor`` and ``ceiling``.
+    """
+
+    def __init__(self, ceiling: float, floor: float = 1.0, multiplier: float = 2.0,
+                 samples: int = 200, min_samples: int = 20):
+        self.ceiling = ceiling
+        self.floor = floor
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=samples)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * 0.95) - 1)]
+
+    def timeout(self) -> float:
+        p95 = self.p95()
+        if p95 is None:
+            return self.ceiling
+        return max(self.floor, min(self.ceiling, p95 * self.multiplier))
+
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_after: Optional[float]) -> T:
+    """
+    Await ``call()``; if it hasn't finished after ``hedge_after`` seconds,
+    start a second identical call and return whichever finishes first.
+
+    Only for idempotent requests.  The loser is cancelled.  If the first to
+    finish raised, the other one is still given its chance.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None or not pending:
+                    return task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class PendingCalls:
+    """
+    Calls still running when a response had to go out, kept so a follow-up
+    request can collect the result.  Entries older than ``ttl`` are dropped.
+    """
+
+    def __init__(self, ttl: float = 120.0):
+        self.ttl = ttl
+        self._groups: Dict[str, tuple] = {}   # token -> (created, {name: task})
+
+    def add(self, tasks: Dict[str, asyncio.Task]) -> str:
+        now = time.monotonic()
+        for token, (created, group) in list(self._groups.items()):
+            if created < now - self.ttl:
+                for task in group.values():
+                    task.cancel()
+                del self._groups[token]
+        token = secrets.token_urlsafe(12)
+        self._groups[token] = (now, dict(tasks))
+        return token
+
+    def get(self, token: str, name: str) -> Optional[asyncio.Task]:
+        group = self._groups.get(token)
+        return group[1].get(name) if group else None
@@ -8,4 +8,5 @@ if [[ "$VIRTUAL_ENV" !=  "(mybooks)" ]]; then
   exit 1
 fi
 
+# Development server; for production use `uv run python serve.py --workers N`
 uv run uvicorn main:app --reload